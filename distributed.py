@@ -0,0 +1,314 @@
+"""
+A module for spreading an exact search over several worker processes.
+
+The coordinator expands the game tree from the current state down to a
+split depth and turns every distinct unfinished position there into a job:
+the compact encoding of the position, to be solved exactly. Workers connect
+over TCP and speak the line-based JSON protocol of game_server:
+
+    worker:      {"op": "ready"}
+    coordinator: {"op": "job", "id": 3, "game": "h", "state": "<hex>"}
+    worker:      {"op": "result", "id": 3, "value": -1}
+    coordinator: {"op": "wait", "delay": 0.1}  or  {"op": "done"}
+
+Every worker message is answered with the next instruction. A job handed to
+a worker whose connection drops, or that holds it longer than the lease, is
+put back in the queue for another worker; the first result to come back
+counts. Once every job is solved the values are backed up through the top
+of the tree, and the move picked is the one minimax_recursive_strategy
+picks: the first of the best moves in the order of get_possible_moves.
+
+Usage:
+    python distributed.py coordinate --game h --size 4 --depth 2 --port 9000
+    python distributed.py work --host 127.0.0.1 --port 9000
+"""
+import argparse
+import asyncio
+import json
+import socket
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from endgame import EndgameSolver
+from game_server import GAMES, load_game
+from move_cache import state_key
+from strategy import helper_score, search_moves
+
+WAIT_DELAY = 0.1
+
+
+class Coordinator:
+    """
+    The jobs of one distributed search and the workers solving them.
+
+    === Attributes ===
+    game: the game whose current state is searched.
+    game_key: the kind of game, a key of game_server.GAMES.
+    split_depth: how many moves below the root the jobs start.
+    lease: the seconds a worker may hold a job before it is handed out
+    again, or None to wait for as long as the worker is connected.
+    jobs: the encoded position of each job, by id.
+    results: the value of each solved job for its player to move, by id.
+    requeued: the number of times a job was handed out again.
+    """
+    game: Any
+    game_key: str
+    split_depth: int
+    lease: Optional[float]
+    jobs: Dict[int, bytes]
+    results: Dict[int, int]
+    requeued: int
+
+    def __init__(self, game: Any, game_key: str, split_depth: int,
+                 lease: Optional[float] = None) -> None:
+        """
+        Initialize a Coordinator splitting the search of game at
+        split_depth, which is at least 1.
+
+        >>> from substract_square_game import SubstractSquareGame
+        >>> coordinator = Coordinator(SubstractSquareGame.create(10), 's', 2)
+        >>> len(coordinator.jobs)
+        3
+        """
+        if split_depth < 1:
+            raise ValueError("The split depth must be at least 1")
+        self.game = game
+        self.game_key = game_key
+        self.split_depth = split_depth
+        self.lease = lease
+        self.jobs = {}
+        self.results = {}
+        self.requeued = 0
+        self._ids: Dict[bytes, int] = {}
+        self._queue: Deque[int] = deque()
+        self._leases: Dict[int, tuple] = {}
+        self._finished: Optional[asyncio.Event] = None
+        self._split(game.current_state, split_depth)
+        self._queue.extend(self.jobs)
+
+    def _split(self, state: Any, depth: int) -> None:
+        """
+        Add a job for every unfinished position depth moves below state.
+        """
+        if self.game.is_over(state):
+            return
+        if depth == 0:
+            key = state_key(state)
+            if key not in self._ids:
+                self._ids[key] = len(self.jobs)
+                self.jobs[self._ids[key]] = state.to_bytes()
+            return
+        for move in search_moves(state):
+            self._split(state.make_move(move), depth - 1)
+
+    def value(self, state: Any, depth: int) -> int:
+        """
+        Return the value of state, depth moves above the jobs, for its player
+        to move, from the results of the jobs.
+        """
+        if self.game.is_over(state):
+            return helper_score(self.game, state)
+        if depth == 0:
+            return self.results[self._ids[state_key(state)]]
+        return max(-self.value(state.make_move(move), depth - 1)
+                   for move in search_moves(state))
+
+    def best_move(self) -> Any:
+        """
+        Return the move minimax_recursive_strategy would pick, once every job
+        is solved.
+
+        >>> from substract_square_game import SubstractSquareGame
+        >>> coordinator = Coordinator(SubstractSquareGame.create(4), 's', 1)
+        >>> coordinator.results = {0: 1}
+        >>> coordinator.best_move()
+        4
+        """
+        state = self.game.current_state
+        moves = search_moves(state)
+        scores = [-self.value(state.make_move(move), self.split_depth - 1)
+                  for move in moves]
+        return moves[scores.index(max(scores))]
+
+    def is_finished(self) -> bool:
+        """
+        Return whether every job is solved.
+        """
+        return len(self.results) == len(self.jobs)
+
+    def _expire_leases(self) -> None:
+        """
+        Put the jobs held longer than the lease back in the queue.
+        """
+        if self.lease is None:
+            return
+        now = time.monotonic()
+        for job, (_, started) in list(self._leases.items()):
+            if now - started > self.lease:
+                del self._leases[job]
+                self._queue.append(job)
+                self.requeued += 1
+
+    def _release(self, worker: int) -> None:
+        """
+        Put the unsolved jobs of worker back in the queue.
+        """
+        for job, (holder, _) in list(self._leases.items()):
+            if holder == worker:
+                del self._leases[job]
+                self._queue.append(job)
+                self.requeued += 1
+
+    def answer(self, worker: int, message: dict) -> dict:
+        """
+        Record message from worker and return the next instruction for it.
+
+        >>> from substract_square_game import SubstractSquareGame
+        >>> coordinator = Coordinator(SubstractSquareGame.create(4), 's', 1)
+        >>> job = coordinator.answer(1, {'op': 'ready'})
+        >>> job['op'], coordinator.answer(1, {'op': 'result', 'id': job['id'],
+        ...                                   'value': 1})
+        ('job', {'op': 'done'})
+        """
+        if message.get('op') == 'result':
+            job = int(message['id'])
+            self._leases.pop(job, None)
+            if job in self.jobs and job not in self.results:
+                self.results[job] = int(message['value'])
+                if self.is_finished() and self._finished is not None:
+                    self._finished.set()
+        self._expire_leases()
+        while self._queue:
+            job = self._queue.popleft()
+            if job not in self.results:
+                self._leases[job] = (worker, time.monotonic())
+                return {'op': 'job', 'id': job, 'game': self.game_key,
+                        'state': self.jobs[job].hex()}
+        if self.is_finished():
+            return {'op': 'done'}
+        return {'op': 'wait', 'delay': WAIT_DELAY}
+
+    async def handle_worker(self, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> None:
+        """
+        Serve one worker connection until it closes, then hand its unsolved
+        jobs to the other workers.
+        """
+        worker = id(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = self.answer(worker, json.loads(line))
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            self._release(worker)
+            writer.close()
+
+    async def start(self, host: str = '127.0.0.1',
+                    port: int = 0) -> asyncio.AbstractServer:
+        """
+        Return a running TCP server for workers on host and port (any free
+        port if 0).
+        """
+        self._finished = asyncio.Event()
+        if self.is_finished():
+            self._finished.set()
+        return await asyncio.start_server(self.handle_worker, host, port)
+
+    async def wait(self) -> Any:
+        """
+        Wait until every job is solved and return the best move.
+        """
+        await self._finished.wait()
+        return self.best_move()
+
+
+def solve_job(message: dict, solver: EndgameSolver) -> int:
+    """
+    Return the value of the position of the job message for its player to
+    move, searched exactly by solver.
+
+    >>> from state_of_game import SubstractSquareState
+    >>> job = {'game': 's', 'state': SubstractSquareState(True, 5).to_bytes()
+    ...        .hex()}
+    >>> solve_job(job, EndgameSolver())
+    -1
+    """
+    game = load_game(message['game'], bytes.fromhex(message['state']))
+    return solver.search(game, game.current_state, -2, 2, 0)
+
+
+def run_worker(host: str, port: int, retries: int = 50) -> int:
+    """
+    Solve jobs from the coordinator at host and port until it has none
+    left, and return the number of jobs solved. Connecting is retried
+    retries times, WAIT_DELAY apart, while the coordinator starts.
+    """
+    for attempt in range(retries + 1):
+        try:
+            connection = socket.create_connection((host, port))
+            break
+        except ConnectionRefusedError:
+            if attempt == retries:
+                raise
+            time.sleep(WAIT_DELAY)
+    solver = EndgameSolver()
+    solved = 0
+    with connection, connection.makefile('rwb') as stream:
+        message = {'op': 'ready'}
+        while True:
+            stream.write(json.dumps(message).encode() + b'\n')
+            stream.flush()
+            line = stream.readline()
+            if not line:
+                return solved
+            reply = json.loads(line)
+            if reply['op'] == 'done':
+                return solved
+            if reply['op'] == 'wait':
+                time.sleep(reply.get('delay', WAIT_DELAY))
+                message = {'op': 'ready'}
+            else:
+                message = {'op': 'result', 'id': reply['id'],
+                           'value': solve_job(reply, solver)}
+                solved += 1
+
+
+async def coordinate(game: Any, game_key: str, split_depth: int,
+                     host: str = '127.0.0.1', port: int = 0,
+                     lease: Optional[float] = None) -> Any:
+    """
+    Serve the jobs of a search of game split at split_depth on host and
+    port until workers have solved them all, and return the best move.
+    """
+    coordinator = Coordinator(game, game_key, split_depth, lease)
+    listener = await coordinator.start(host, port)
+    async with listener:
+        return await coordinator.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distributed search.")
+    parser.add_argument('mode', choices=['coordinate', 'work'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--game', choices=sorted(GAMES), default='h')
+    parser.add_argument('--size', type=int, default=3)
+    parser.add_argument('--p2-starts', action='store_true')
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--lease', type=float, default=None)
+    arguments = parser.parse_args()
+    if arguments.mode == 'work':
+        print("Solved {} jobs".format(run_worker(arguments.host,
+                                                 arguments.port)))
+    else:
+        root = GAMES[arguments.game][0].create(arguments.size,
+                                               not arguments.p2_starts)
+        print("Best move: {}".format(asyncio.run(coordinate(
+            root, arguments.game, arguments.depth, arguments.host,
+            arguments.port, arguments.lease))))
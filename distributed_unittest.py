@@ -0,0 +1,74 @@
+"""
+Unittests for the distributed search.
+"""
+
+import asyncio
+import json
+import unittest
+from multiprocessing import Process
+from distributed import Coordinator, run_worker
+from perft import initial_state
+from stonehenge_game import StonehengeGame
+from substract_square_game import SubstractSquareGame
+from strategy import minimax_recursive_strategy
+
+
+class DistributedUnitTests(unittest.TestCase):
+    def search(self, game, game_key, depth, workers=2, flaky=0):
+        """
+        Run a Coordinator for game with workers worker processes, and flaky
+        clients that take a job and disconnect without answering, and return
+        the best move and the Coordinator.
+        """
+        async def flaky_worker(port):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(json.dumps({'op': 'ready'}).encode() + b'\n')
+            await writer.drain()
+            job = json.loads(await reader.readline())
+            writer.close()
+            await writer.wait_closed()
+            return job
+
+        async def main():
+            coordinator = Coordinator(game, game_key, depth)
+            listener = await coordinator.start()
+            port = listener.sockets[0].getsockname()[1]
+            async with listener:
+                taken = [await flaky_worker(port) for _ in range(flaky)]
+                processes = [Process(target=run_worker,
+                                     args=('127.0.0.1', port))
+                             for _ in range(workers)]
+                for process in processes:
+                    process.start()
+                move = await coordinator.wait()
+                # Workers still waiting are told they are done.
+                loop = asyncio.get_running_loop()
+                for process in processes:
+                    await loop.run_in_executor(None, process.join)
+            return move, coordinator, taken
+
+        return asyncio.run(main())
+
+    def test_stonehenge_matches_minimax(self):
+        """
+        The distributed search picks the move of minimax_recursive_strategy.
+        """
+        state = initial_state('h', 2).make_move('B')
+        game = StonehengeGame.from_state(state)
+        move, coordinator, _ = self.search(game, 'h', 2)
+        self.assertEqual(move, minimax_recursive_strategy(game))
+        self.assertEqual(len(coordinator.results), len(coordinator.jobs))
+
+    def test_failed_worker_jobs_are_requeued(self):
+        """
+        Jobs taken by workers that disconnect are solved by the others.
+        """
+        game = SubstractSquareGame.create(30)
+        move, coordinator, taken = self.search(game, 's', 2, flaky=2)
+        self.assertTrue(all(job['op'] == 'job' for job in taken))
+        self.assertEqual(coordinator.requeued, 2)
+        self.assertEqual(move, minimax_recursive_strategy(game))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,251 @@
+"""
+A module for solving endgames exactly and for a hybrid strategy built on it.
+
+Heuristic play is weakest near the end of a game, which is exactly where an
+exact search is cheap. EndgameSolver is an alpha-beta search that remembers
+every position it has solved in a transposition table, so positions reached
+through different move orders are only searched once. HybridStrategy plays
+Monte Carlo tree search while many Stonehenge cells are open and switches to
+EndgameSolver once at most threshold cells are left. After every exact
+solve it compares the time taken with its budget and moves the threshold so
+the next solves stay within it: up when even the next larger endgame is
+predicted to fit at the measured node rate, down when a solve ran over.
+"""
+import time
+from typing import Any, Dict, Optional, Tuple
+from memory_budget import DEFAULT_BUDGET
+from move_cache import state_key
+from move_ordering import MoveOrderer
+from mcts import mcts_strategy
+from stonehenge_state import StonehengeState
+from strategy import helper_score, search_moves
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class EndgameSolver:
+    """
+    An exact alpha-beta search with a transposition table.
+
+    === Attributes ===
+    table: the solved positions, keyed by state_key, as (score, bound) with
+    bound EXACT, LOWER or UPPER. States without a state_key are searched
+    but never stored.
+    capacity: the most positions table keeps; the oldest are dropped first.
+    orderer: the MoveOrderer used to order moves below the root.
+    nodes: the number of positions searched so far.
+    evictions: the number of positions dropped from table.
+    """
+    table: Dict[bytes, Tuple[int, int]]
+    capacity: int
+    orderer: MoveOrderer
+    nodes: int
+    evictions: int
+
+    def __init__(self, capacity: Optional[int] = None) -> None:
+        """
+        Initialize an EndgameSolver with an empty transposition table of
+        capacity positions, the cache_entries of DEFAULT_BUDGET if None.
+
+        >>> from substract_square_game import SubstractSquareGame
+        >>> solver = EndgameSolver(capacity=10)
+        >>> solver.best_move(SubstractSquareGame.create(40))
+        1
+        >>> len(solver.table), solver.evictions > 0
+        (10, True)
+        """
+        self.table = {}
+        self.capacity = DEFAULT_BUDGET.cache_entries if capacity is None \
+            else capacity
+        self.orderer = MoveOrderer()
+        self.nodes = 0
+        self.evictions = 0
+
+    def search(self, game: Any, state: Any, alpha: int, beta: int,
+               ply: int) -> int:
+        """
+        Return the score of state for its player to move if it lies between
+        alpha and beta; otherwise return a bound past alpha or beta.
+        """
+        self.nodes += 1
+        if game.is_over(state):
+            return helper_score(game, state)
+        if isinstance(state, StonehengeState) and state.can_win_now():
+            return 1
+        key = state_key(state)
+        entry = None if key is None else self.table.get(key)
+        if entry is not None:
+            score, bound = entry
+            if bound == EXACT or (bound == LOWER and score >= beta) or \
+                    (bound == UPPER and score <= alpha):
+                return score
+        original_alpha = alpha
+        moves = self.orderer.order(state, search_moves(state), ply)
+        best_score = -2
+        for move in moves:
+            score = -self.search(game, state.make_move(move), -beta, -alpha,
+                                 ply + 1)
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self.orderer.record_cutoff(move, ply, len(moves))
+                        break
+        if best_score <= original_alpha:
+            bound = UPPER
+        elif best_score >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        if key is None:
+            return best_score
+        if key not in self.table and len(self.table) >= self.capacity:
+            del self.table[next(iter(self.table))]
+            self.evictions += 1
+        self.table[key] = (best_score, bound)
+        return best_score
+
+    def best_move(self, game: Any) -> Any:
+        """
+        Return the first move, in the order of get_possible_moves, with the
+        best score from the current state of game: the move
+        minimax_recursive_strategy picks.
+
+        >>> from stonehenge_game import StonehengeGame
+        >>> state = StonehengeState(False, 2, ['A', 'B', '2', '1', 'E', 'F',
+        ...                                    '1'])
+        >>> EndgameSolver().best_move(StonehengeGame.from_state(state))
+        'B'
+        >>> from subtraction_game import (SubtractionGame, SubtractionSolver,
+        ...                               finite_set, primes, squares)
+        >>> solver = EndgameSolver()
+        >>> for moves in [squares(), primes(), finite_set([1, 3, 4])]:
+        ...     exact = SubtractionSolver(moves, 100)
+        ...     print([n for n in range(2, 60) if exact.winning_moves(n) and
+        ...            solver.best_move(SubtractionGame.create(
+        ...                n, move_set=moves)) not in exact.winning_moves(n)])
+        []
+        []
+        []
+        """
+        state = game.current_state
+        if isinstance(state, StonehengeState):
+            state.threats()
+        best_move = None
+        best_score = -2
+        for move in search_moves(state):
+            score = -self.search(game, state.make_move(move), -2,
+                                 -best_score, 1)
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if best_score == 1:
+                    break
+        return best_move
+
+
+class HybridStrategy:
+    """
+    A strategy that searches Stonehenge openings with Monte Carlo tree search
+    and solves endgames exactly. Other games are always solved exactly.
+
+    === Attributes ===
+    threshold: the most open cells an endgame may have to be solved exactly.
+    budget: the number of seconds an exact solve should take at most.
+    min_threshold: the lowest threshold tuning may set.
+    max_threshold: the highest threshold tuning may set.
+    solver: the EndgameSolver used for endgames.
+    node_rate: the nodes per second measured on the last exact solve, or
+    None before the first one.
+    """
+    threshold: int
+    budget: float
+    min_threshold: int
+    max_threshold: int
+    solver: EndgameSolver
+    node_rate: Optional[float]
+
+    def __init__(self, threshold: int = 10, budget: float = 1.0,
+                 min_threshold: int = 4, max_threshold: int = 25,
+                 opening: Any = mcts_strategy) -> None:
+        """
+        Initialize a HybridStrategy that solves endgames of at most
+        threshold open cells in about budget seconds and plays the opening
+        with the strategy opening.
+        """
+        self.__name__ = 'hybrid_strategy'
+        self.threshold = threshold
+        self.budget = budget
+        self.min_threshold = min_threshold
+        self.max_threshold = max_threshold
+        self.solver = EndgameSolver()
+        self.node_rate = None
+        self._opening = opening
+
+    def __call__(self, game: Any) -> Any:
+        """
+        Return the move for game.
+
+        >>> from stonehenge_game import StonehengeGame
+        >>> state = StonehengeState(False, 2, ['A', 'B', '2', '1', 'E', 'F',
+        ...                                    '1'])
+        >>> HybridStrategy()(StonehengeGame.from_state(state))
+        'B'
+        >>> from subtraction_game import (SubtractionGame, SubtractionSolver,
+        ...                               finite_set)
+        >>> moves = finite_set([1, 3, 4])
+        >>> exact = SubtractionSolver(moves)
+        >>> hybrid = HybridStrategy()
+        >>> [n for n in range(2, 60) if exact.winning_moves(n) and
+        ...  hybrid(SubtractionGame.create(n, move_set=moves))
+        ...  not in exact.winning_moves(n)]
+        []
+        """
+        state = game.current_state
+        if not isinstance(state, StonehengeState):
+            return self.solver.best_move(game)
+        empty = len(state.get_possible_moves())
+        if empty > self.threshold:
+            return self._opening(game)
+        nodes = self.solver.nodes
+        start = time.perf_counter()
+        move = self.solver.best_move(game)
+        self.tune(empty, self.solver.nodes - nodes,
+                  time.perf_counter() - start)
+        return move
+
+    def tune(self, empty: int, nodes: int, seconds: float) -> None:
+        """
+        Adjust threshold after an exact solve of an endgame with empty open
+        cells that searched nodes positions in seconds. With every open cell
+        a move, an endgame with one more open cell is predicted to take
+        about empty + 1 times as many nodes.
+
+        >>> hybrid = HybridStrategy(threshold=8, budget=1.0)
+        >>> hybrid.tune(8, 1000, 0.01)
+        >>> hybrid.threshold, hybrid.node_rate
+        (9, 100000.0)
+        >>> hybrid.tune(9, 1000000, 4.0)
+        >>> hybrid.threshold
+        8
+        """
+        if seconds <= 0:
+            return
+        self.node_rate = nodes / seconds
+        predicted = nodes * (empty + 1) / self.node_rate
+        if seconds > self.budget:
+            self.threshold = max(self.min_threshold,
+                                 min(self.threshold, empty - 1))
+        elif predicted <= self.budget and empty >= self.threshold:
+            self.threshold = min(self.max_threshold, empty + 1)
+
+
+hybrid_strategy = HybridStrategy()
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
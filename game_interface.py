@@ -9,23 +9,79 @@ strategy cannot be used on Chopsticks unless you account for infinite loops.
 your own curiousity!)
 """
 # TODO: import the modules needed to make game_interface run.
-from strategy import *
-from typing import Any, Callable
-from substract_square_game import SubstractSquareGame
-from stonehenge_game import StonehengeGame
+# Games and strategies are imported when they are first looked up, so that
+# starting the interface only pays for the ones that are played.
+import importlib.util
+import os
+from typing import Any, Callable, List, Optional
+from lazy_registry import LazyRegistry
+from memory_budget import DEFAULT_BUDGET, budgeted_strategy
+from move_cache import cached_strategy
+from game_profiler import GameProfiler
+from game_record import append_record, start_record
 
 # TODO: Replace None with the corresponding class name for your games.
 # 'h' should map to Stonehenge.
-playable_games = {'s': SubstractSquareGame,
-                  'h': StonehengeGame}
+playable_games = LazyRegistry({
+    's': 'substract_square_game:SubstractSquareGame',
+    'h': 'stonehenge_game:StonehengeGame',
+    'c': 'substract_square_game:ChopsticksGame'})
+
+
+def _wrap_strategy(key: str, strategy: Callable) -> Callable:
+    """
+    Return strategy as the interface uses it: every computer strategy
+    answers through the shared move cache, within the memory budget.
+    """
+    if key == 'i':
+        return strategy
+    return budgeted_strategy(cached_strategy(strategy))
+
 
 # TODO: Replace None with the corresponding function names for your strategies.
 # 'mr' should map to your recursive implementation of minimax while
 # 'mi' should map to your iterative implementation of minimax
-usable_strategies = {'i': interactive_strategy,
-                     'ro': rough_outcome_strategy,
-                     'mr': minimax_recursive_strategy,
-                     'mi': minimax_iterative_strategy}
+usable_strategies = LazyRegistry({
+    'i': 'strategy:interactive_strategy',
+    'ro': 'strategy:rough_outcome_strategy',
+    'mr': 'strategy:minimax_recursive_strategy',
+    'mi': 'strategy:minimax_iterative_strategy',
+    'ms': 'strategy:minimax_stack_strategy',
+    'rg': 'retrograde:retrograde_strategy',
+    'ab': 'strategy:alphabeta_strategy',
+    'mc': 'mcts:mcts_strategy',
+    'pm': 'parallel_mcts:parallel_mcts_strategy',
+    'hy': 'endgame:hybrid_strategy'}, _wrap_strategy)
+
+# The games a strategy can play, for strategies that cannot play them all.
+strategy_games = {}
+
+if importlib.util.find_spec('numpy') is not None:
+    usable_strategies.register('nb',
+                               'stonehenge_batch:batch_evaluation_strategy')
+    strategy_games['nb'] = ['h']
+    usable_strategies.register('rp', 'stonehenge_batch:rollout_strategy')
+    strategy_games['rp'] = ['h']
+
+# States of Chopsticks can repeat, so searches that assume every line of
+# play ends never return on it; only these strategies can play it.
+game_strategies = {'c': ['i', 'rg']}
+
+
+def strategies_for(game_key: str) -> List[str]:
+    """
+    Return the keys of usable_strategies that can play the game of
+    game_key.
+
+    >>> strategies_for('c')
+    ['i', 'rg']
+    >>> [key in strategies_for('s') for key in ['mr', 'nb', 'rp']]
+    [True, False, False]
+    """
+    if game_key in game_strategies:
+        return game_strategies[game_key]
+    return [key for key in usable_strategies
+            if game_key in strategy_games.get(key, [game_key])]
 
 
 class GameInterface:
@@ -35,7 +91,8 @@ class GameInterface:
     """
 
     def __init__(self, game: Any, p1_strategy: Callable,
-                 p2_strategy: Callable[[Any], Any]) -> None:
+                 p2_strategy: Callable[[Any], Any],
+                 profiler: Optional[GameProfiler] = None) -> None:
         """
         Initialize this GameInterface, setting its active game to game, and
         using the strategies p1_strategy for Player 1 and p2_strategy for
@@ -47,6 +104,9 @@ class GameInterface:
         :type p1_strategy:
         :param p2_strategy: The strategy for Play 2.
         :type p2_strategy:
+        :param profiler: The profiler of the game loop, set by the
+        environment if None.
+        :type profiler: GameProfiler
         """
         first_player = input("Type y if player 1 is to make the first move: ")
         is_p1_turn = False
@@ -56,44 +116,112 @@ class GameInterface:
         self.game = game(is_p1_turn)
         self.p1_strategy = p1_strategy
         self.p2_strategy = p2_strategy
+        self.profiler = GameProfiler.from_env() if profiler is None \
+            else profiler
+        self.record_path = os.environ.get('GAME_RECORD')
+        self.record = None
+
+    @classmethod
+    def from_game(cls, game: Any, p1_strategy: Callable,
+                  p2_strategy: Callable[[Any], Any],
+                  profiler: Optional[GameProfiler] = None) -> 'GameInterface':
+        """
+        Return a GameInterface playing game, an already built game such as
+        StonehengeGame.create(3), with the strategies p1_strategy and
+        p2_strategy and the profiler profiler (set by the environment if
+        None), without asking for any input.
+
+        >>> interface = GameInterface.from_game(
+        ...     playable_games['s'].create(4), usable_strategies['mr'],
+        ...     usable_strategies['mr'])
+        >>> interface.game.current_state.number
+        4
+        """
+        interface = cls.__new__(cls)
+        interface.game = game
+        interface.p1_strategy = p1_strategy
+        interface.p2_strategy = p2_strategy
+        interface.profiler = GameProfiler.from_env() if profiler is None \
+            else profiler
+        interface.record_path = os.environ.get('GAME_RECORD')
+        interface.record = None
+        return interface
 
     def play(self) -> None:
         """
-        Play the game.
+        Play the game. If record_path is set, keep the GameRecord of the
+        game in record and add it to the record file at record_path.
+
+        >>> profiler = GameProfiler()
+        >>> interface = GameInterface.from_game(
+        ...     playable_games['s'].create(2), usable_strategies['mr'],
+        ...     usable_strategies['mr'], profiler)
+        >>> interface.record_path = os.devnull
+        >>> interface.play() # doctest: +ELLIPSIS
+        Players take turns subtracting square numbers...
+        Player 2 is the winner!
+        >>> len(profiler.moves), sorted(profiler.phases)
+        (2, ['is_valid_move', 'make_move', 'print', 'strategy'])
+        >>> str(interface.record)
+        's 2 p1 1 1'
         """
+        profiler = self.profiler
         current_state = self.game.current_state
+        self.record = start_record(current_state) if self.record_path \
+            else None
 
-        print(self.game.get_instructions())
-        print(current_state)
+        with profiler.phase('print'):
+            print(self.game.get_instructions())
+            print(current_state)
+
+        # Games with cycles (Chopsticks) are drawn once a state repeats
+        # three times.
+        repetitions = {repr(current_state): 1}
 
         # Pick moves until the game is over
         while not self.game.is_over(current_state):
             move_to_make = None
+            current_player_name = current_state.get_current_player_name()
+            profiler.start_move(current_player_name)
 
             # Print out all of the valid moves
-            possible_moves = current_state.get_possible_moves()
-            print("The current available moves are:")
-            for move in possible_moves:
-                print(move)
+            with profiler.phase('print'):
+                possible_moves = current_state.get_possible_moves()
+                print("The current available moves are:")
+                for move in possible_moves:
+                    print(move)
 
             # Pick a (legal) move.
-            while not current_state.is_valid_move(move_to_make):
-                current_strategy = self.p2_strategy
-                if current_state.get_current_player_name() == 'p1':
-                    current_strategy = self.p1_strategy
-                move_to_make = current_strategy(self.game)
+            current_strategy = self.p2_strategy
+            if current_player_name == 'p1':
+                current_strategy = self.p1_strategy
+            while True:
+                with profiler.phase('is_valid_move'):
+                    valid = current_state.is_valid_move(move_to_make)
+                if valid:
+                    break
+                with profiler.phase('strategy'):
+                    move_to_make = current_strategy(self.game)
 
             # Apply the move
-            current_player_name = current_state.get_current_player_name()
-            new_game_state = current_state.make_move(move_to_make)
+            with profiler.phase('make_move'):
+                new_game_state = current_state.make_move(move_to_make)
             self.game.current_state = new_game_state
             current_state = self.game.current_state
+            if self.record is not None:
+                self.record.moves.append(move_to_make)
 
-            print("{} made the move {}. The game's state is now:".format(
-                current_player_name, move_to_make))
-            print(current_state)
-            # print(current_state.marker)
-            # print(current_state.left_layline)
+            with profiler.phase('print'):
+                print("{} made the move {}. The game's state is now:".format(
+                    current_player_name, move_to_make))
+                print(current_state)
+            profiler.end_move(move_to_make)
+
+            key = repr(current_state)
+            repetitions[key] = repetitions.get(key, 0) + 1
+            if repetitions[key] == 3:
+                print("The same state has come up three times.")
+                break
 
         # Print out the winner of the game
         if self.game.is_winner("p1"):
@@ -102,32 +230,58 @@ class GameInterface:
             print("Player 2 is the winner!")
         else:
             print("It's a tie!")
-
+        if DEFAULT_BUDGET.track:
+            print(DEFAULT_BUDGET.report())
+        if self.record is not None:
+            append_record(self.record_path, self.record)
+        if profiler.enabled and profiler.path is not None:
+            print(profiler.summary())
+            print("Profile written to {}".format(
+                " and ".join(profiler.write())))
 
 if __name__ == '__main__':
-    games = ", ".join(["'{}': {}".format(key, playable_games[key].__name__) if
-                       playable_games[key] is not None else
-                       "'{}': None".format(key) for key in playable_games])
+    import argparse
+    parser = argparse.ArgumentParser(description="Play a game.")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="write a profile of the game to PATH.json and "
+                             "PATH.txt")
+    parser.add_argument('--cprofile', action='store_true',
+                        help="run cProfile around every move")
+    parser.add_argument('--memory', action='store_true',
+                        help="measure the peak memory of every move")
+    parser.add_argument('--record', metavar='PATH',
+                        help="add the record of the game to PATH")
+    arguments = parser.parse_args()
+    game_profiler = GameProfiler.from_env()
+    if arguments.profile:
+        game_profiler = GameProfiler(True, arguments.profile,
+                                     arguments.cprofile, arguments.memory)
 
-    strategies = ", ".join(["'{}': {}".format(key,
-                                              usable_strategies[key].__name__)
-                            if usable_strategies[key] is not None else
-                            "'{}': None".format(key)
-                            for key in usable_strategies])
+    games = ", ".join(["'{}': {}".format(key, playable_games.name(key))
+                       for key in playable_games])
 
     chosen_game = ''
     while chosen_game not in playable_games.keys():
         chosen_game = input(
             "Select the game you want to play ({}): ".format(games))
 
+    allowed = strategies_for(chosen_game)
+    strategies = ", ".join(["'{}': {}".format(key,
+                                              usable_strategies.name(key))
+                            for key in allowed])
+
     p1 = ''
     p2 = ''
 
-    while p1 not in usable_strategies.keys():
+    while p1 not in allowed:
         p1 = input("Select the strategy for Player 1 ({}): ".format(strategies))
 
-    while p2 not in usable_strategies.keys():
+    while p2 not in allowed:
         p2 = input("Select the strategy for Player 2 ({}): ".format(strategies))
 
-    GameInterface(playable_games[chosen_game], usable_strategies[p1],
-                  usable_strategies[p2]).play()
+    interface = GameInterface(playable_games[chosen_game],
+                              usable_strategies[p1], usable_strategies[p2],
+                              game_profiler)
+    if arguments.record:
+        interface.record_path = arguments.record
+    interface.play()
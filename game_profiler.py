@@ -0,0 +1,260 @@
+"""
+A module for profiling the game loop.
+
+GameInterface.play spends its time in a few phases: asking a strategy for a
+move, checking the move with is_valid_move, applying it with make_move and
+printing the board. A GameProfiler times every phase of every move and can
+also run cProfile and tracemalloc around each move. At the end of a game it
+writes a report as JSON and as a text summary.
+
+Profiling is off unless a GameProfiler is enabled, either by passing one to
+GameInterface or through the environment:
+
+    GAME_PROFILE=path           write path.json and path.txt after each game
+    GAME_PROFILE_CPROFILE=1     also run cProfile around every move
+    GAME_PROFILE_MEMORY=1       also measure the peak memory of every move
+
+A disabled GameProfiler hands out one shared do-nothing context for every
+phase, so the game loop pays a method call per phase and nothing more;
+cProfile, pstats and tracemalloc are only imported once they are used.
+"""
+import json
+import os
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional
+
+TOP_FUNCTIONS = 10
+_NO_PHASE = nullcontext()
+
+
+class _Phase:
+    """
+    The timer of one phase of a move.
+    """
+
+    def __init__(self, profiler: 'GameProfiler', name: str) -> None:
+        """
+        Initialize a _Phase timing name for profiler.
+        """
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        """
+        Start timing.
+        """
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """
+        Stop timing and record the time taken.
+        """
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+
+
+class GameProfiler:
+    """
+    The time spent in every phase of a game.
+
+    === Attributes ===
+    enabled: whether anything is recorded.
+    path: where report files are written, without their extension, or None
+    to not write them.
+    use_cprofile: whether cProfile runs around every move.
+    use_tracemalloc: whether the peak memory of every move is measured.
+    phases: the total seconds and number of calls of every phase.
+    moves: a record of every move: its player, move, seconds per phase and,
+    when enabled, its peak memory and busiest functions.
+    """
+    enabled: bool
+    path: Optional[str]
+    use_cprofile: bool
+    use_tracemalloc: bool
+    phases: Dict[str, List[float]]
+    moves: List[dict]
+
+    def __init__(self, enabled: bool = True, path: Optional[str] = None,
+                 use_cprofile: bool = False,
+                 use_tracemalloc: bool = False) -> None:
+        """
+        Initialize a GameProfiler with nothing recorded yet.
+        """
+        self.enabled = enabled
+        self.path = path
+        self.use_cprofile = use_cprofile
+        self.use_tracemalloc = use_tracemalloc
+        self.phases = {}
+        self.moves = []
+        self._move: Optional[dict] = None
+        self._profile: Any = None
+        self._tracing = False
+        self._started = 0.0
+
+    @classmethod
+    def from_env(cls) -> 'GameProfiler':
+        """
+        Return the GameProfiler set by the GAME_PROFILE, GAME_PROFILE_CPROFILE
+        and GAME_PROFILE_MEMORY environment variables: a disabled one unless
+        GAME_PROFILE is set.
+        """
+        path = os.environ.get('GAME_PROFILE')
+        return cls(bool(path), path or None,
+                   bool(os.environ.get('GAME_PROFILE_CPROFILE')),
+                   bool(os.environ.get('GAME_PROFILE_MEMORY')))
+
+    def phase(self, name: str) -> Any:
+        """
+        Return a context timing the phase name of the current move.
+
+        >>> profiler = GameProfiler()
+        >>> with profiler.phase('print'):
+        ...     pass
+        >>> profiler.phases['print'][1]
+        1
+        >>> disabled = GameProfiler(False)
+        >>> disabled.phase('print') is disabled.phase('strategy')
+        True
+        >>> disabled.phases
+        {}
+        """
+        if not self.enabled:
+            return _NO_PHASE
+        return _Phase(self, name)
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Add seconds spent in the phase name.
+        """
+        totals = self.phases.setdefault(name, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += 1
+        if self._move is not None:
+            times = self._move['phases']
+            times[name] = times.get(name, 0.0) + seconds
+
+    def start_move(self, player: str) -> None:
+        """
+        Start recording a move of player.
+        """
+        if not self.enabled:
+            return
+        self._move = {'player': player, 'move': None, 'phases': {}}
+        if self.use_tracemalloc:
+            import tracemalloc
+            self._tracing = not tracemalloc.is_tracing()
+            if self._tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        if self.use_cprofile:
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._started = time.perf_counter()
+
+    def end_move(self, move: Any) -> None:
+        """
+        Finish recording the current move, which played move.
+
+        >>> profiler = GameProfiler(use_cprofile=True, use_tracemalloc=True)
+        >>> profiler.start_move('p1')
+        >>> with profiler.phase('strategy'):
+        ...     _ = sorted(range(1000))
+        >>> profiler.end_move(3)
+        >>> record = profiler.moves[0]
+        >>> record['move'], list(record['phases']), record['peak_bytes'] > 0
+        (3, ['strategy'], True)
+        >>> len(record['functions']) > 0
+        True
+        """
+        if not self.enabled or self._move is None:
+            return
+        record = self._move
+        record['seconds'] = time.perf_counter() - self._started
+        if self._profile is not None:
+            self._profile.disable()
+            record['functions'] = top_functions(self._profile)
+            self._profile = None
+        if self.use_tracemalloc:
+            import tracemalloc
+            record['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            if self._tracing:
+                tracemalloc.stop()
+                self._tracing = False
+        record['move'] = move if isinstance(move, (int, str)) else repr(move)
+        self.moves.append(record)
+        self._move = None
+
+    def report(self) -> dict:
+        """
+        Return everything recorded, ready to be written as JSON.
+
+        >>> profiler = GameProfiler()
+        >>> profiler.record('make_move', 0.5)
+        >>> profiler.report()['phases']
+        {'make_move': {'seconds': 0.5, 'calls': 1}}
+        """
+        return {'moves': self.moves,
+                'phases': {name: {'seconds': seconds, 'calls': calls}
+                           for name, (seconds, calls) in self.phases.items()}}
+
+    def summary(self) -> str:
+        """
+        Return a text summary of the time spent in every phase, the busiest
+        first.
+
+        >>> profiler = GameProfiler()
+        >>> profiler.record('print', 0.25)
+        >>> profiler.record('strategy', 0.75)
+        >>> print(profiler.summary())
+        0 moves, 1.000 s profiled
+        phase                 seconds   calls  share
+        strategy                0.750       1  75.0%
+        print                   0.250       1  25.0%
+        """
+        total = sum(seconds for seconds, _ in self.phases.values())
+        lines = ["{} moves, {:.3f} s profiled".format(len(self.moves), total),
+                 "{:<18}{:>11}{:>8}{:>7}".format('phase', 'seconds', 'calls',
+                                                 'share')]
+        for name, (seconds, calls) in sorted(self.phases.items(),
+                                             key=lambda item: -item[1][0]):
+            lines.append("{:<18}{:>11.3f}{:>8}{:>6.1f}%".format(
+                name, seconds, calls, 100 * seconds / total if total else 0))
+        peaks = [move['peak_bytes'] for move in self.moves
+                 if 'peak_bytes' in move]
+        if peaks:
+            lines.append("peak memory of a move: {:.1f} MB".format(
+                max(peaks) / (1 << 20)))
+        return '\n'.join(lines)
+
+    def write(self, path: Optional[str] = None) -> List[str]:
+        """
+        Write the report to path.json and the summary to path.txt, with path
+        the path of this GameProfiler if None, and return the files written.
+        """
+        path = self.path if path is None else path
+        if path is None:
+            return []
+        with open(path + '.json', 'w') as report_file:
+            json.dump(self.report(), report_file, indent=2)
+        with open(path + '.txt', 'w') as summary_file:
+            summary_file.write(self.summary() + '\n')
+        return [path + '.json', path + '.txt']
+
+
+def top_functions(profile: Any, count: int = TOP_FUNCTIONS) -> List[dict]:
+    """
+    Return the count functions of the cProfile.Profile profile with the most
+    cumulative time.
+    """
+    import pstats
+    stats = pstats.Stats(profile).stats
+    busiest = sorted(stats.items(), key=lambda item: -item[1][3])[:count]
+    return [{'function': '{}:{}({})'.format(*function), 'calls': entry[1],
+             'seconds': entry[3]} for function, entry in busiest]
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,377 @@
+"""
+A module for recording games and analysing the records.
+
+A game record is one line of text: the kind of game (a key of
+game_server.GAMES), its size (the side length for Stonehenge, the starting
+number for Subtract Square), the player who moved first and the moves in the
+order they were made, all separated by spaces:
+
+    h 2 p1 A D G B
+    s 20 p2 16 4
+
+A record file holds one record per line, so the game interface can append
+to it after every game, and files can simply be concatenated. Lines that
+are blank or start with '#' are skipped.
+
+read_records reads a file one line at a time, so files of millions of games
+are never loaded at once. Every position of a record is rebuilt with
+make_move. annotate_records asks a strategy for its move in every position
+of every game, spread over worker processes, and reports the moves where the
+player did worse than the strategy. A move is only judged when the position
+has few enough moves left to be solved exactly.
+
+Usage:
+    python game_record.py replay games.txt
+    python game_record.py annotate games.txt --strategy ab --workers 4
+"""
+import argparse
+import json
+from collections import deque
+from typing import (TYPE_CHECKING, Any, Callable, Iterable, Iterator, List,
+                    Optional, TextIO)
+
+if TYPE_CHECKING:  # annotate_records imports concurrent.futures when run
+    from concurrent.futures import Executor
+
+SIZE_ATTRIBUTES = {'h': 'side_length', 's': 'number'}
+# The key of each recorded kind of game by the name of its state class, so
+# recording a game does not import game_server.
+STATE_GAMES = {'StonehengeState': 'h', 'SubstractSquareState': 's'}
+EXACT_LIMIT = 10
+_SOLVER = None
+
+
+class GameRecord:
+    """
+    The record of one game.
+
+    === Attributes ===
+    game_key: the kind of game, a key of game_server.GAMES.
+    size: the side length or starting number of the game.
+    first_player: 'p1' or 'p2', whoever moved first.
+    moves: the moves made, in order.
+    """
+    game_key: str
+    size: int
+    first_player: str
+    moves: list
+
+    def __init__(self, game_key: str, size: int, first_player: str,
+                 moves: Optional[list] = None) -> None:
+        """
+        Initialize a GameRecord of a game of game_key and size started by
+        first_player, with moves made so far.
+        """
+        self.game_key = game_key
+        self.size = size
+        self.first_player = first_player
+        self.moves = [] if moves is None else moves
+
+    @classmethod
+    def from_line(cls, line: str) -> 'GameRecord':
+        """
+        Return the GameRecord written on line.
+
+        >>> record = GameRecord.from_line('s 20 p2 16 4\\n')
+        >>> record.game_key, record.size, record.first_player, record.moves
+        ('s', 20, 'p2', [16, 4])
+        >>> GameRecord.from_line('x 1')
+        Traceback (most recent call last):
+        ...
+        ValueError: Bad game record: 'x 1'
+        """
+        fields = line.split()
+        if len(fields) < 3 or fields[0] not in SIZE_ATTRIBUTES or \
+                fields[2] not in ('p1', 'p2') or not fields[1].isdigit():
+            raise ValueError("Bad game record: {!r}".format(line.strip()))
+        moves = fields[3:]
+        if fields[0] == 's':
+            moves = [int(move) for move in moves]
+        return cls(fields[0], int(fields[1]), fields[2], moves)
+
+    def __str__(self) -> str:
+        """
+        Return this GameRecord as a line of a record file, without the line
+        break.
+
+        >>> str(GameRecord('h', 2, 'p1', ['A', 'D']))
+        'h 2 p1 A D'
+        """
+        return ' '.join([self.game_key, str(self.size), self.first_player] +
+                        [str(move) for move in self.moves])
+
+    def new_game(self) -> Any:
+        """
+        Return the game this GameRecord starts from.
+        """
+        from game_server import GAMES
+        return GAMES[self.game_key][0].create(self.size,
+                                              self.first_player == 'p1')
+
+    def positions(self) -> Iterator[tuple]:
+        """
+        Yield the game of this GameRecord and, for every move, the state it
+        was made in and the move, rebuilding each state with make_move.
+
+        >>> game, *played = GameRecord('s', 5, 'p1', [4, 1]).positions()
+        >>> [(state.number, move) for state, move in played]
+        [(5, 4), (1, 1)]
+        >>> game.current_state.number
+        0
+        """
+        game = self.new_game()
+        yield game
+        state = game.current_state
+        for ply, move in enumerate(self.moves):
+            if game.is_over(state) or not state.is_valid_move(move):
+                raise ValueError("Illegal move {!r} at ply {} of {}".format(
+                    move, ply, self))
+            yield state, move
+            state = state.make_move(move)
+            game.current_state = state
+
+    def winner(self) -> Optional[str]:
+        """
+        Return the player who won the game, or None if it was not finished
+        or tied.
+
+        >>> GameRecord('s', 5, 'p1', [4, 1]).winner()
+        'p2'
+        """
+        positions = self.positions()
+        game = next(positions)
+        for _ in positions:
+            pass
+        return winner_of(game)
+
+
+def winner_of(game: Any) -> Optional[str]:
+    """
+    Return the player who has won game, or None.
+    """
+    for player in ('p1', 'p2'):
+        if game.is_winner(player):
+            return player
+    return None
+
+
+def start_record(state: Any) -> Optional[GameRecord]:
+    """
+    Return an empty GameRecord of a game starting at state, or None if that
+    kind of game cannot be recorded.
+
+    >>> from state_of_game import SubstractSquareState
+    >>> str(start_record(SubstractSquareState(False, 9)))
+    's 9 p2'
+    >>> from state_of_game import ChopsticsState
+    >>> start_record(ChopsticsState(True)) is None
+    True
+    """
+    game_key = STATE_GAMES.get(type(state).__name__)
+    if game_key is None:
+        return None
+    return GameRecord(game_key, getattr(state, SIZE_ATTRIBUTES[game_key]),
+                      state.get_current_player_name())
+
+
+def append_record(path: str, record: GameRecord) -> None:
+    """
+    Add record to the end of the record file at path.
+    """
+    with open(path, 'a') as record_file:
+        record_file.write(str(record) + '\n')
+
+
+def read_records(source: Any) -> Iterator[GameRecord]:
+    """
+    Yield the records of source, a path or an open text file, one line at a
+    time.
+
+    >>> import io
+    >>> [str(record) for record in read_records(io.StringIO(
+    ...     '# header\\nh 1 p1 A\\n\\ns 4 p2 4\\n'))]
+    ['h 1 p1 A', 's 4 p2 4']
+    """
+    if isinstance(source, str):
+        with open(source) as record_file:
+            yield from read_records(record_file)
+        return
+    for line in source:
+        if line.strip() and not line.lstrip().startswith('#'):
+            yield GameRecord.from_line(line)
+
+
+def move_values(game: Any, state: Any) -> dict:
+    """
+    Return the exact score of every move of state for the player making it.
+
+    >>> from substract_square_game import SubstractSquareGame
+    >>> game = SubstractSquareGame.create(8)
+    >>> move_values(game, game.current_state)
+    {1: 1, 4: -1}
+    """
+    global _SOLVER
+    if _SOLVER is None:
+        from endgame import EndgameSolver
+        _SOLVER = EndgameSolver()
+    return {move: -_SOLVER.search(game, state.make_move(move), -2, 2, 1)
+            for move in state.get_possible_moves()}
+
+
+def annotate_line(line: str, strategy_key: str,
+                  exact_limit: int = EXACT_LIMIT) -> dict:
+    """
+    Return the annotation of the game recorded on line: its winner, the
+    number of positions, how often the player's move differed from the move
+    of strategy_key, and the blunders, the moves that scored worse than the
+    best move in positions with at most exact_limit moves.
+
+    >>> note = annotate_line('s 10 p1 1 1 4 4', 'mr')
+    >>> note['winner'], note['positions'], note['disagreements']
+    ('p2', 4, 2)
+    >>> [(blunder['ply'], blunder['played'], blunder['suggested'])
+    ...  for blunder in note['blunders']]
+    [(1, 1, 4), (2, 4, 1)]
+    """
+    from game_interface import usable_strategies
+    strategy = usable_strategies[strategy_key]
+    record = GameRecord.from_line(line)
+    positions = record.positions()
+    game = next(positions)
+    disagreements = 0
+    blunders = []
+    for ply, (state, move) in enumerate(positions):
+        game.current_state = state
+        suggested = strategy(game)
+        if suggested == move:
+            continue
+        disagreements += 1
+        if len(state.get_possible_moves()) <= exact_limit:
+            values = move_values(game, state)
+            if values[move] < values[suggested]:
+                blunders.append({'ply': ply,
+                                 'player': state.get_current_player_name(),
+                                 'played': move, 'suggested': suggested,
+                                 'score': values[move],
+                                 'best': values[suggested]})
+    # positions has left game at the final state.
+    return {'record': str(record), 'winner': winner_of(game),
+            'positions': len(record.moves), 'disagreements': disagreements,
+            'blunders': blunders}
+
+
+def bounded_map(executor: 'Executor', function: Callable, items: Iterable,
+                window: int) -> Iterator[Any]:
+    """
+    Yield function(item) for every item, in order, computed by executor, a
+    concurrent.futures.Executor, with at most window items in flight, so
+    items is read lazily.
+
+    >>> from concurrent.futures import ThreadPoolExecutor
+    >>> with ThreadPoolExecutor(2) as executor:
+    ...     list(bounded_map(executor, abs, iter([-1, 2, -3]), 2))
+    [1, 2, 3]
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(function, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _annotate_lines(job: tuple) -> List[dict]:
+    """
+    Return the annotations of the lines of job, a tuple of the lines, the
+    strategy key and the exact limit. This runs in the worker processes.
+    """
+    lines, strategy_key, exact_limit = job
+    return [annotate_line(line, strategy_key, exact_limit) for line in lines]
+
+
+def _batches(source: Any, size: int) -> Iterator[List[str]]:
+    """
+    Yield the record lines of source in lists of size lines.
+    """
+    batch = []
+    for record in read_records(source):
+        batch.append(str(record))
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def annotate_records(source: Any, strategy_key: str, workers: int = 1,
+                     batch: int = 64,
+                     exact_limit: int = EXACT_LIMIT) -> Iterator[dict]:
+    """
+    Yield the annotation of every record of source, a path or an open text
+    file, in order. Records are sent to workers processes in batches of
+    batch records.
+
+    >>> import io
+    >>> [note['winner'] for note in annotate_records(io.StringIO(
+    ...     's 4 p1 4\\ns 5 p1 4 1\\n'), 'mr')]
+    ['p1', 'p2']
+    """
+    jobs = ((lines, strategy_key, exact_limit)
+            for lines in _batches(source, batch))
+    if workers <= 1:
+        for job in jobs:
+            yield from _annotate_lines(job)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(workers) as executor:
+        for notes in bounded_map(executor, _annotate_lines, jobs,
+                                 2 * workers):
+            yield from notes
+
+
+def replay_summary(source: Any) -> dict:
+    """
+    Return the number of games, positions and wins of each player in the
+    records of source, replaying every game.
+
+    >>> import io
+    >>> replay_summary(io.StringIO('s 4 p1 4\\ns 5 p1 4 1\\nh 1 p2 A\\n'))
+    {'games': 3, 'positions': 4, 'p1': 1, 'p2': 2, 'unfinished': 0}
+    """
+    summary = {'games': 0, 'positions': 0, 'p1': 0, 'p2': 0, 'unfinished': 0}
+    for record in read_records(source):
+        summary['games'] += 1
+        summary['positions'] += len(record.moves)
+        summary[record.winner() or 'unfinished'] += 1
+    return summary
+
+
+def main(output: TextIO, argv: Any = None) -> None:
+    """
+    Run the replay or annotation of a record file from the command line,
+    writing to output.
+    """
+    parser = argparse.ArgumentParser(description="Analyse game records.")
+    parser.add_argument('mode', choices=['replay', 'annotate'])
+    parser.add_argument('path', help="a file of game records")
+    parser.add_argument('--strategy', default='ab',
+                        help="key of usable_strategies used to annotate")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--batch', type=int, default=64,
+                        help="records sent to a worker at once")
+    parser.add_argument('--exact-limit', type=int, default=EXACT_LIMIT,
+                        help="most moves of a position judged exactly")
+    arguments = parser.parse_args(argv)
+    if arguments.mode == 'replay':
+        output.write(json.dumps(replay_summary(arguments.path)) + '\n')
+        return
+    for note in annotate_records(arguments.path, arguments.strategy,
+                                 arguments.workers, arguments.batch,
+                                 arguments.exact_limit):
+        output.write(json.dumps(note) + '\n')
+
+
+if __name__ == "__main__":
+    import sys
+    main(sys.stdout)
@@ -0,0 +1,258 @@
+"""
+A module for serving many games at once over a socket.
+
+The server speaks a line-based JSON protocol: every request is one JSON
+object on its own line and gets exactly one JSON object back. Requests:
+
+    {"op": "new", "game": "h", "size": 3, "p1_starts": true,
+     "p1": "i", "p2": "mr"}
+    {"op": "move", "session": "...", "move": "A"}
+    {"op": "state", "session": "..."}
+    {"op": "close", "session": "..."}
+
+"game" is a key of GAMES and "p1"/"p2" are keys of usable_strategies, where
+'i' means the moves come from the client. After every request the AI
+players move until it is a client's turn or the game is over, and the reply
+describes the resulting state. AI moves are computed in a process pool so a
+slow search in one session does not hold up the others. Between requests a
+session only keeps the compact binary encoding of its state.
+
+Usage:
+    python game_server.py --port 8765
+    python game_server.py --unix /tmp/games.sock
+"""
+import argparse
+import asyncio
+import itertools
+import json
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict
+from stonehenge_game import StonehengeGame
+from stonehenge_state import StonehengeState
+from substract_square_game import SubstractSquareGame
+from state_of_game import SubstractSquareState
+
+GAMES = {'h': (StonehengeGame, StonehengeState),
+         's': (SubstractSquareGame, SubstractSquareState)}
+HUMAN = 'i'
+
+
+def new_state(game_key: str, size: int, p1_starts: bool) -> Any:
+    """
+    Return the starting state of the game game_key, where size is the side
+    length for Stonehenge and the starting number for Subtract Square.
+
+    >>> new_state('s', 20, True).number
+    20
+    """
+    return GAMES[game_key][0].create(size, p1_starts).current_state
+
+
+def load_game(game_key: str, data: bytes) -> Any:
+    """
+    Return a game of kind game_key whose current state is encoded in data.
+
+    >>> data = SubstractSquareState(True, 20).to_bytes()
+    >>> load_game('s', data).current_state.number
+    20
+    """
+    game_class, state_class = GAMES[game_key]
+    return game_class.from_state(state_class.from_bytes(data))
+
+
+def compute_move(game_key: str, data: bytes, strategy_key: str) -> Any:
+    """
+    Return the move strategy_key picks in the game game_key whose state is
+    encoded in data. This runs in the worker processes.
+
+    >>> compute_move('s', SubstractSquareState(True, 4).to_bytes(), 'mr')
+    4
+    """
+    from game_interface import usable_strategies
+    return usable_strategies[strategy_key](load_game(game_key, data))
+
+
+class Session:
+    """
+    One game hosted by the server.
+
+    === Attributes ===
+    game_key: the kind of game, a key of GAMES.
+    data: the compact encoding of the current state.
+    strategies: the strategy key of 'p1' and 'p2'.
+    lock: held while a request for this session is being handled.
+    """
+    game_key: str
+    data: bytes
+    strategies: Dict[str, str]
+    lock: asyncio.Lock
+
+    def __init__(self, game_key: str, state: Any,
+                 strategies: Dict[str, str]) -> None:
+        """
+        Initialize a Session of game_key starting from state.
+        """
+        self.game_key = game_key
+        self.data = state.to_bytes()
+        self.strategies = strategies
+        self.lock = asyncio.Lock()
+
+    def game(self) -> Any:
+        """
+        Return a game object for the current state of this Session.
+        """
+        return load_game(self.game_key, self.data)
+
+
+class GameServer:
+    """
+    An asyncio server hosting concurrent game sessions.
+
+    === Attributes ===
+    sessions: the open sessions by id.
+    executor: the pool AI moves are computed in.
+    """
+    sessions: Dict[str, Session]
+    executor: Executor
+
+    def __init__(self, executor: Any = None) -> None:
+        """
+        Initialize a GameServer computing AI moves in executor, a new
+        ProcessPoolExecutor if None.
+        """
+        self.sessions = {}
+        self.executor = executor if executor is not None \
+            else ProcessPoolExecutor()
+        self._ids = itertools.count(1)
+
+    def describe(self, session_id: str, session: Session) -> dict:
+        """
+        Return the reply describing the current state of session.
+        """
+        game = session.game()
+        state = game.current_state
+        reply = {'ok': True, 'session': session_id, 'board': str(state),
+                 'player': state.get_current_player_name(),
+                 'moves': state.get_possible_moves(),
+                 'over': game.is_over(state)}
+        if reply['over']:
+            reply['winner'] = 'p1' if game.is_winner('p1') else \
+                'p2' if game.is_winner('p2') else None
+        return reply
+
+    async def play_ai_moves(self, session: Session) -> None:
+        """
+        Let the AI players of session move until it is a client's turn or
+        the game is over.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            game = session.game()
+            state = game.current_state
+            strategy_key = session.strategies[state.get_current_player_name()]
+            if game.is_over(state) or strategy_key == HUMAN:
+                return
+            move = await loop.run_in_executor(
+                self.executor, compute_move, session.game_key, session.data,
+                strategy_key)
+            session.data = state.make_move(move).to_bytes()
+
+    async def handle_request(self, request: dict) -> dict:
+        """
+        Return the reply to request.
+        """
+        from game_interface import usable_strategies
+        op = request.get('op')
+        if op == 'new':
+            game_key = request.get('game')
+            if game_key not in GAMES:
+                raise ValueError("Unknown game: {}".format(game_key))
+            strategies = {'p1': request.get('p1', HUMAN),
+                          'p2': request.get('p2', HUMAN)}
+            for key in strategies.values():
+                if key not in usable_strategies:
+                    raise ValueError("Unknown strategy: {}".format(key))
+            state = new_state(game_key, int(request['size']),
+                              bool(request.get('p1_starts', True)))
+            session_id = str(next(self._ids))
+            session = Session(game_key, state, strategies)
+            self.sessions[session_id] = session
+        else:
+            session_id = str(request.get('session'))
+            if session_id not in self.sessions:
+                raise ValueError("Unknown session: {}".format(session_id))
+            session = self.sessions[session_id]
+            if op == 'close':
+                del self.sessions[session_id]
+                return {'ok': True, 'session': session_id}
+            if op not in ('move', 'state'):
+                raise ValueError("Unknown op: {}".format(op))
+        async with session.lock:
+            if op == 'move':
+                game = session.game()
+                state = game.current_state
+                move = game.str_to_move(str(request.get('move')))
+                if session.strategies[state.get_current_player_name()] \
+                        != HUMAN or not state.is_valid_move(move):
+                    raise ValueError("Invalid move: {}".format(
+                        request.get('move')))
+                session.data = state.make_move(move).to_bytes()
+            await self.play_ai_moves(session)
+            return self.describe(session_id, session)
+
+    async def handle_client(self, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> None:
+        """
+        Answer the requests of one connection until it closes.
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    reply = await self.handle_request(json.loads(line))
+                except Exception as error:  # reported back to the client
+                    reply = {'ok': False,
+                             'error': "{}: {}".format(type(error).__name__,
+                                                      error)}
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def start_tcp(self, host: str = '127.0.0.1',
+                        port: int = 0) -> asyncio.AbstractServer:
+        """
+        Return a running TCP server on host and port (any free port if 0).
+        """
+        return await asyncio.start_server(self.handle_client, host, port)
+
+    async def start_unix(self, path: str) -> asyncio.AbstractServer:
+        """
+        Return a running Unix socket server at path.
+        """
+        return await asyncio.start_unix_server(self.handle_client, path)
+
+
+async def serve(server: GameServer, args: Any) -> None:
+    """
+    Run server on the socket given by the command line args forever.
+    """
+    if args.unix:
+        listener = await server.start_unix(args.unix)
+    else:
+        listener = await server.start_tcp(args.host, args.port)
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve games over JSON.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="listen on this Unix socket instead")
+    parser.add_argument('--workers', type=int, default=None)
+    arguments = parser.parse_args()
+    asyncio.run(serve(GameServer(ProcessPoolExecutor(arguments.workers)),
+                      arguments))
@@ -0,0 +1,91 @@
+"""
+Unittests for the game server.
+"""
+
+import asyncio
+import json
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from game_server import GameServer
+
+
+class GameServerUnitTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.executor = ProcessPoolExecutor(2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+
+    def run_client(self, *requests_per_client):
+        """
+        Start a server, send each list of requests over its own connection
+        concurrently, and return the replies of each connection.
+        """
+        async def client(port, requests):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            replies = []
+            for request in requests:
+                if callable(request):
+                    request = request(replies)
+                writer.write(json.dumps(request).encode() + b'\n')
+                await writer.drain()
+                replies.append(json.loads(await reader.readline()))
+            writer.close()
+            return replies
+
+        async def main():
+            server = GameServer(self.executor)
+            listener = await server.start_tcp()
+            port = listener.sockets[0].getsockname()[1]
+            async with listener:
+                return await asyncio.gather(*[client(port, requests) for
+                                              requests in requests_per_client])
+
+        return asyncio.run(main())
+
+    def test_ai_versus_ai_plays_to_the_end(self):
+        """
+        A game between two AIs is played out by a single request.
+        """
+        [[reply]] = self.run_client([{'op': 'new', 'game': 's', 'size': 18,
+                                      'p1': 'mr', 'p2': 'mr'}])
+        self.assertTrue(reply['ok'])
+        self.assertTrue(reply['over'])
+        self.assertEqual(reply['winner'], 'p1')
+
+    def test_human_moves_and_ai_replies(self):
+        """
+        A client move is answered by the AI in the same reply.
+        """
+        new = {'op': 'new', 'game': 'h', 'size': 2, 'p1_starts': True,
+               'p1': 'i', 'p2': 'mr'}
+
+        def move(replies):
+            return {'op': 'move', 'session': replies[0]['session'],
+                    'move': 'A'}
+
+        [[created, moved]] = self.run_client([new, move])
+        self.assertEqual(created['player'], 'p1')
+        self.assertEqual(len(created['moves']), 7)
+        self.assertTrue(moved['ok'])
+        self.assertEqual(moved['player'], 'p1')
+        self.assertEqual(len(moved['moves']), 5)
+
+    def test_concurrent_sessions_and_errors(self):
+        """
+        Sessions on different connections are independent, and bad requests
+        get an error reply without closing the connection.
+        """
+        game = {'op': 'new', 'game': 's', 'size': 30, 'p1': 'mr', 'p2': 'mi'}
+        bad = {'op': 'move', 'session': 'nope', 'move': 1}
+        replies = self.run_client([game, bad, game], [game, game])
+        self.assertFalse(replies[0][1]['ok'])
+        sessions = [reply['session'] for client in replies for reply in client
+                    if reply['ok']]
+        self.assertEqual(len(set(sessions)), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+A module for registries of games and strategies that are imported on use.
+
+Importing every game and strategy up front makes starting the game interface
+pay for modules the chosen game never touches, NumPy among them. A
+LazyRegistry maps keys to 'module:name' specs, the same way perft names an
+alternative engine, and only imports a module when one of its keys is looked
+up. Everything else about it is a read-only dict.
+"""
+import importlib
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional
+
+
+class LazyRegistry(Mapping):
+    """
+    A mapping of keys to objects imported on first lookup.
+
+    === Attributes ===
+    specs: the 'module:name' spec of every key, in registration order.
+    loaded: the objects looked up so far, by key.
+    """
+    specs: Dict[str, str]
+    loaded: Dict[str, Any]
+
+    def __init__(self, specs: Dict[str, str],
+                 wrap: Optional[Callable[[str, Any], Any]] = None) -> None:
+        """
+        Initialize a LazyRegistry of specs. When wrap is given, the object of
+        a key is wrap(key, object) instead.
+
+        >>> registry = LazyRegistry({'perft': 'perft:initial_state'})
+        >>> list(registry), registry.loaded
+        (['perft'], {})
+        >>> registry['perft']('s', 10).number
+        10
+        >>> list(registry.loaded)
+        ['perft']
+        """
+        self.specs = dict(specs)
+        self.loaded = {}
+        self._wrap = wrap
+
+    def register(self, key: str, spec: str) -> None:
+        """
+        Add key, or replace it, with the object named by spec.
+        """
+        self.specs[key] = spec
+        self.loaded.pop(key, None)
+
+    def name(self, key: str) -> str:
+        """
+        Return the name of the object of key, without importing it.
+
+        >>> LazyRegistry({'s': 'substract_square_game:SubstractSquareGame'}
+        ...              ).name('s')
+        'SubstractSquareGame'
+        """
+        return self.specs[key].partition(':')[2]
+
+    def __getitem__(self, key: str) -> Any:
+        """
+        Return the object of key, importing it on first use.
+
+        >>> LazyRegistry({})['x']
+        Traceback (most recent call last):
+        ...
+        KeyError: 'x'
+        """
+        if key not in self.loaded:
+            module_name, _, name = self.specs[key].partition(':')
+            item = getattr(importlib.import_module(module_name), name)
+            if self._wrap is not None:
+                item = self._wrap(key, item)
+            self.loaded[key] = item
+        return self.loaded[key]
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Return an iterator over the keys, in registration order.
+        """
+        return iter(self.specs)
+
+    def __len__(self) -> int:
+        """
+        Return the number of keys.
+        """
+        return len(self.specs)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,151 @@
+"""
+A module for Monte Carlo tree search.
+
+Full minimax is out of reach on large Stonehenge boards. Monte Carlo tree
+search instead grows a tree from the current state one node per iteration:
+it walks down the tree picking the child with the best UCT score, adds one
+untried move, finishes the game from there with random moves, and credits
+the result to every node on the way back up. The move played is the most
+visited child of the root.
+
+Playouts are seeded from the state they start at, so a search of the same
+state with the same number of iterations always picks the same move.
+"""
+import math
+import random
+from typing import Any, List, Optional
+from move_cache import state_key
+from stonehenge_state import StonehengeState
+from strategy import helper_score
+
+DEFAULT_ITERATIONS = 400
+EXPLORATION = 1.4
+
+
+class Node:
+    """
+    A node of the search tree.
+
+    === Attributes ===
+    state: the state at this node.
+    move: the move that led here from parent, or None at the root.
+    parent: the node above this one, or None at the root.
+    children: the nodes of the moves tried from state.
+    untried: the moves of state that have no node yet.
+    visits: the number of playouts through this node.
+    wins: the score of those playouts for the player who moved into state;
+    a win counts 1 and a tie 1/2.
+    """
+    state: Any
+    move: Any
+    parent: Optional['Node']
+    children: List['Node']
+    untried: list
+    visits: int
+    wins: float
+
+    def __init__(self, state: Any, move: Any = None,
+                 parent: Optional['Node'] = None) -> None:
+        """
+        Initialize a Node for state, reached by move from parent.
+        """
+        self.state = state
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried = list(state.get_possible_moves())
+        self.visits = 0
+        self.wins = 0.0
+
+    def uct_child(self, exploration: float) -> 'Node':
+        """
+        Return the child with the highest UCT score.
+        """
+        log_visits = math.log(self.visits)
+        return max(self.children,
+                   key=lambda child: child.wins / child.visits +
+                   exploration * math.sqrt(log_visits / child.visits))
+
+    def expand(self, rng: random.Random) -> 'Node':
+        """
+        Add the node of a random untried move and return it.
+        """
+        move = self.untried.pop(rng.randrange(len(self.untried)))
+        child = Node(self.state.make_move(move), move, self)
+        self.children.append(child)
+        return child
+
+
+def playout(game: Any, state: Any, rng: random.Random) -> int:
+    """
+    Finish the game from state with random moves and return the score of
+    the result for the player to move at state.
+
+    >>> from stonehenge_game import StonehengeGame
+    >>> state = StonehengeState(True, 1, ['1', 'B', 'C'])
+    >>> game = StonehengeGame.from_state(state)
+    >>> playout(game, state, random.Random(0))
+    -1
+    """
+    sign = 1
+    while not game.is_over(state):
+        if isinstance(state, StonehengeState) and state.can_win_now():
+            return sign
+        moves = state.get_possible_moves()
+        if not moves:
+            break
+        state = state.make_move(moves[rng.randrange(len(moves))])
+        sign = -sign
+    return sign * helper_score(game, state)
+
+
+def mcts_search(game: Any, iterations: int = DEFAULT_ITERATIONS,
+                exploration: float = EXPLORATION,
+                rng: Optional[random.Random] = None) -> Node:
+    """
+    Return the root of a search tree grown for iterations playouts from the
+    current state of game.
+
+    >>> from stonehenge_game import StonehengeGame
+    >>> state = StonehengeState(True, 2, ['1', 'B', 'C', 'D', 'E', 'F', 'G'])
+    >>> root = mcts_search(StonehengeGame.from_state(state), 50)
+    >>> root.visits, sum(child.visits for child in root.children)
+    (50, 50)
+    """
+    root = Node(game.current_state)
+    if isinstance(root.state, StonehengeState):
+        root.state.threats()
+    if rng is None:
+        rng = random.Random(state_key(root.state))
+    for _ in range(iterations):
+        node = root
+        while not node.untried and node.children:
+            node = node.uct_child(exploration)
+        if node.untried and not game.is_over(node.state):
+            node = node.expand(rng)
+        # Score for the player who moved into node.
+        result = -playout(game, node.state, rng)
+        while node is not None:
+            node.visits += 1
+            node.wins += (result + 1) / 2
+            result = -result
+            node = node.parent
+    return root
+
+
+def mcts_strategy(game: Any) -> Any:
+    """
+    Return the most visited move of a Monte Carlo tree search of game.
+
+    >>> from stonehenge_game import StonehengeGame
+    >>> state = StonehengeState(False, 2, ['A', 'B', '2', '1', 'E', 'F', '1'])
+    >>> mcts_strategy(StonehengeGame.from_state(state))
+    'B'
+    """
+    root = mcts_search(game)
+    return max(root.children, key=lambda child: child.visits).move
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,135 @@
+"""
+A module for the memory budget of the strategies.
+
+Searches keep three kinds of things in memory: cached moves, transposition
+table entries and the nodes of a search in progress. A MemoryBudget caps the
+first two at cache_entries entries each, evicting the oldest past that, and
+the last at max_nodes nodes, past which the iterative minimax searches the
+rest of a subtree depth-first instead of expanding it. The budget can be
+given in megabytes through the GAME_MEMORY_MB environment variable, which
+is split evenly between caches and nodes. With GAME_MEMORY_TRACK set, the
+game interface also measures the peak memory used by every strategy call
+and reports it at the end of a game.
+"""
+import os
+from typing import Any, Callable
+
+# Rough sizes measured with tracemalloc: a cached move with its key, and a
+# search node holding a side-4 StonehengeState.
+ENTRY_BYTES = 256
+NODE_BYTES = 3072
+MEGABYTE = 1 << 20
+
+
+class MemoryBudget:
+    """
+    Limits on the memory the strategies use.
+
+    === Attributes ===
+    cache_entries: the most entries each move cache or transposition table
+    keeps.
+    max_nodes: the most nodes an iterative search keeps at once.
+    track: whether measure is used around strategy calls.
+    peak: the highest memory use, in bytes, seen by measure.
+    """
+    cache_entries: int
+    max_nodes: int
+    track: bool
+    peak: int
+
+    def __init__(self, cache_entries: int = 100000, max_nodes: int = 50000,
+                 track: bool = False) -> None:
+        """
+        Initialize a MemoryBudget with the given limits.
+        """
+        self.cache_entries = cache_entries
+        self.max_nodes = max_nodes
+        self.track = track
+        self.peak = 0
+
+    @classmethod
+    def from_megabytes(cls, megabytes: float,
+                       track: bool = False) -> 'MemoryBudget':
+        """
+        Return a MemoryBudget of about megabytes, half for caches and half
+        for search nodes.
+
+        >>> budget = MemoryBudget.from_megabytes(64)
+        >>> budget.cache_entries, budget.max_nodes
+        (131072, 10922)
+        """
+        half = int(megabytes * MEGABYTE) // 2
+        return cls(max(1, half // ENTRY_BYTES), max(1, half // NODE_BYTES),
+                   track)
+
+    @classmethod
+    def from_env(cls) -> 'MemoryBudget':
+        """
+        Return the MemoryBudget set by the GAME_MEMORY_MB and
+        GAME_MEMORY_TRACK environment variables, or the default one.
+        """
+        track = bool(os.environ.get('GAME_MEMORY_TRACK'))
+        megabytes = os.environ.get('GAME_MEMORY_MB')
+        if megabytes:
+            return cls.from_megabytes(float(megabytes), track)
+        return cls(track=track)
+
+    def measure(self, function: Callable, *args: Any) -> Any:
+        """
+        Return function(*args), recording the peak memory it used.
+
+        >>> budget = MemoryBudget()
+        >>> len(budget.measure(bytearray, 100000))
+        100000
+        >>> budget.peak >= 100000
+        True
+        """
+        import tracemalloc
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        try:
+            return function(*args)
+        finally:
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            if started:
+                tracemalloc.stop()
+
+    def report(self) -> str:
+        """
+        Return a summary of this MemoryBudget and the peak memory measured.
+
+        >>> MemoryBudget(1000, 10).report()
+        'memory: peak 0.0 MB, cache entries <= 1000, search nodes <= 10'
+        """
+        return "memory: peak {:.1f} MB, cache entries <= {}, " \
+               "search nodes <= {}".format(self.peak / MEGABYTE,
+                                           self.cache_entries, self.max_nodes)
+
+
+DEFAULT_BUDGET = MemoryBudget.from_env()
+
+
+def budgeted_strategy(strategy: Callable,
+                      budget: Any = None) -> Callable:
+    """
+    Return strategy, measuring the memory of every call against budget
+    (DEFAULT_BUDGET if None) when it tracks memory.
+    """
+    def wrapper(game: Any) -> Any:
+        """
+        Return the move of strategy for game.
+        """
+        target = DEFAULT_BUDGET if budget is None else budget
+        if target.track:
+            return target.measure(strategy, game)
+        return strategy(game)
+    wrapper.__name__ = getattr(strategy, '__name__', 'strategy')
+    wrapper.__doc__ = strategy.__doc__
+    return wrapper
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
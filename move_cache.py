@@ -0,0 +1,230 @@
+"""
+A module for caching the moves strategies pick.
+
+Strategies are deterministic, so the move one picks only depends on the
+state it is asked about. A MoveCache remembers those moves, keyed by the
+strategy and the compact encoding of the state, and cached_strategy puts one
+in front of a strategy. The cache is a bounded LRU shared by every thread of
+the process; when it is given a file (or the GAME_MOVE_CACHE environment
+variable names one) moves are also stored in a SQLite database there, so the
+worker processes of a server share what any of them has computed.
+"""
+import functools
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from memory_budget import DEFAULT_BUDGET
+
+DEFAULT_CAPACITY = 100000
+_MISSING = object()
+
+
+def state_key(state: Any) -> Optional[bytes]:
+    """
+    Return the canonical key of state: its compact encoding if it has one,
+    its repr otherwise, or None if its repr is the default one, which only
+    holds a memory address that later states may reuse.
+
+    >>> from state_of_game import SubstractSquareState
+    >>> state_key(SubstractSquareState(True, 30))
+    b's:SubstractSquareState:='
+    >>> state_key(object()) is None
+    True
+    """
+    if hasattr(state, 'to_bytes'):
+        encoded = state.to_bytes()
+    elif type(state).__repr__ is object.__repr__:
+        return None
+    else:
+        encoded = repr(state).encode()
+    return b's:' + type(state).__name__.encode() + b':' + encoded
+
+
+class MoveCache:
+    """
+    A thread-safe LRU cache of moves, optionally backed by a file shared
+    between processes.
+
+    === Attributes ===
+    capacity: the largest number of moves kept in memory.
+    path: the SQLite file moves are shared through, or None.
+    hits: the number of lookups answered from memory.
+    file_hits: the number of lookups answered from the file.
+    misses: the number of lookups that found nothing.
+    evictions: the number of moves dropped from memory to stay in capacity.
+    """
+    capacity: int
+    path: Any
+    hits: int
+    file_hits: int
+    misses: int
+    evictions: int
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY,
+                 path: Any = None) -> None:
+        """
+        Initialize an empty MoveCache holding at most capacity moves in
+        memory, sharing them through the file at path if it is given.
+        """
+        self.capacity = capacity
+        self.path = path
+        self.hits = 0
+        self.file_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._connection_pid = None
+
+    def _database(self) -> Any:
+        """
+        Return this process's sqlite3 connection to the cache file, opening
+        it on first use (and again after a fork).
+        """
+        if self._connection is None or self._connection_pid != os.getpid():
+            import sqlite3
+            self._connection = sqlite3.connect(self.path, timeout=30,
+                                               check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS moves "
+                "(key BLOB PRIMARY KEY, move TEXT)")
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    def _remember(self, key: bytes, move: Any) -> None:
+        """
+        Store move under key in memory, evicting the least recently used
+        moves beyond capacity.
+
+        Precondition: the lock is held.
+        """
+        self._entries[key] = move
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: bytes, default: Any = None) -> Any:
+        """
+        Return the move stored under key, or default.
+
+        >>> cache = MoveCache()
+        >>> cache.put(b'a', 'A')
+        >>> cache.get(b'a'), cache.get(b'b')
+        ('A', None)
+        """
+        with self._lock:
+            move = self._entries.get(key, _MISSING)
+            if move is not _MISSING:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return move
+            if self.path is not None:
+                row = self._database().execute(
+                    "SELECT move FROM moves WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    move = json.loads(row[0])
+                    self._remember(key, move)
+                    self.file_hits += 1
+                    return move
+            self.misses += 1
+            return default
+
+    def put(self, key: bytes, move: Any) -> None:
+        """
+        Store move under key.
+
+        >>> cache = MoveCache(capacity=2)
+        >>> for key in [b'a', b'b', b'c']:
+        ...     cache.put(key, key.decode())
+        >>> cache.get(b'a'), cache.get(b'c'), cache.evictions
+        (None, 'c', 1)
+        """
+        with self._lock:
+            self._remember(key, move)
+            if self.path is not None:
+                database = self._database()
+                with database:
+                    database.execute(
+                        "INSERT OR REPLACE INTO moves VALUES (?, ?)",
+                        (key, json.dumps(move)))
+
+    def clear(self) -> None:
+        """
+        Forget every move held in memory and reset the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.file_hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the size and hit-rate metrics of this MoveCache.
+
+        >>> cache = MoveCache()
+        >>> cache.put(b'a', 'A')
+        >>> _ = cache.get(b'a'), cache.get(b'b')
+        >>> cache.stats()['hit_rate']
+        0.5
+        """
+        with self._lock:
+            lookups = self.hits + self.file_hits + self.misses
+            return {'size': len(self._entries), 'capacity': self.capacity,
+                    'hits': self.hits, 'file_hits': self.file_hits,
+                    'misses': self.misses, 'evictions': self.evictions,
+                    'hit_rate': (self.hits + self.file_hits) / lookups
+                                if lookups else 0.0}
+
+
+DEFAULT_CACHE = MoveCache(DEFAULT_BUDGET.cache_entries,
+                          os.environ.get('GAME_MOVE_CACHE'))
+
+
+def cached_strategy(strategy: Callable, cache: Any = None) -> Callable:
+    """
+    Return strategy with cache (DEFAULT_CACHE if None) in front of it.
+    States without a state_key are passed straight to strategy.
+
+    >>> from substract_square_game import SubstractSquareGame
+    >>> from state_of_game import SubstractSquareState
+    >>> from strategy import minimax_recursive_strategy
+    >>> cache = MoveCache()
+    >>> cached = cached_strategy(minimax_recursive_strategy, cache)
+    >>> game = SubstractSquareGame.from_state(SubstractSquareState(True, 18))
+    >>> cached(game), cached(game), cache.hits
+    (1, 1, 1)
+    >>> from subtraction_game import (SubtractionGame, SubtractionSolver,
+    ...                               finite_set)
+    >>> from strategy import minimax_stack_strategy
+    >>> moves = finite_set([1, 3, 4])
+    >>> solver = SubtractionSolver(moves)
+    >>> cached = cached_strategy(minimax_stack_strategy, MoveCache())
+    >>> [n for n in range(1, 22) if solver.winning_moves(n) and
+    ...  cached(SubtractionGame.create(n, move_set=moves)) not in
+    ...  solver.winning_moves(n)]
+    []
+    """
+    @functools.wraps(strategy)
+    def wrapper(game: Any) -> Any:
+        """
+        Return the cached move for game, computing it on a miss.
+        """
+        target = DEFAULT_CACHE if cache is None else cache
+        encoded = state_key(game.current_state)
+        if encoded is None:
+            return strategy(game)
+        key = strategy.__name__.encode() + b':' + encoded
+        move = target.get(key, _MISSING)
+        if move is _MISSING:
+            move = strategy(game)
+            target.put(key, move)
+        return move
+    return wrapper
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
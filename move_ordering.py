@@ -0,0 +1,117 @@
+"""
+A module for ordering moves in pruning searches.
+
+A pruning search cuts off a node as soon as one move is good enough, so the
+sooner good moves are tried the fewer nodes are searched. MoveOrderer
+combines three signals:
+    - tactics: Stonehenge cells that capture a ley-line for the player to
+      move, or stop the opponent from capturing one, come first;
+    - killer moves: the last moves that caused a cutoff at the same ply;
+    - history: how often, and how deep in the tree, each move caused a
+      cutoff so far.
+Killers and history live as long as the MoveOrderer, so a strategy that
+keeps one per game carries them from one move of the game to the next.
+"""
+from typing import Any, Dict, List
+from stonehenge_geometry import get_geometry
+from stonehenge_state import StonehengeState
+
+KILLER_SLOTS = 2
+CAPTURE_BONUS = 1 << 22
+BLOCK_BONUS = 1 << 20
+KILLER_BONUS = 1 << 18
+
+
+def tactical_scores(state: StonehengeState) -> Dict[Any, int]:
+    """
+    Return a score for each open cell of state: CAPTURE_BONUS for every
+    ley-line the player to move captures by claiming it, and BLOCK_BONUS for
+    every ley-line the opponent would capture with it.
+
+    >>> a = StonehengeState(True, 2, ['1', 'B', 'C', 'D', 'E', 'F', 'G'])
+    >>> scores = tactical_scores(a.make_move('E'))
+    >>> scores['B'], scores['F'] == 2 * CAPTURE_BONUS + 2 * BLOCK_BONUS
+    (0, True)
+    """
+    geometry = get_geometry(state.side_length)
+    me, them = (0, 1) if state.p1_turn else (1, 0)
+    counts = state.line_counts()
+    scores = {}
+    for cell, markers in enumerate(geometry.cell_lines):
+        if str(state.cells[cell]).isdigit():
+            continue
+        score = 0
+        for marker in markers:
+            if state.marker[marker] != '@':
+                continue
+            threshold = geometry.line_thresholds[marker]
+            if counts[marker][me] + 1 >= threshold:
+                score += CAPTURE_BONUS
+            if counts[marker][them] + 1 >= threshold:
+                score += BLOCK_BONUS
+        scores[state.cells[cell]] = score
+    return scores
+
+
+class MoveOrderer:
+    """
+    Killer moves and a history table used to order moves.
+
+    === Attributes ===
+    killers: the killer moves of each ply, most recent first.
+    history: the cutoff score of each move.
+    nodes: the number of nodes searched with this MoveOrderer.
+    """
+    killers: Dict[int, List[Any]]
+    history: Dict[Any, int]
+    nodes: int
+
+    def __init__(self) -> None:
+        """
+        Initialize a MoveOrderer with no killers and an empty history.
+        """
+        self.killers = {}
+        self.history = {}
+        self.nodes = 0
+
+    def order(self, state: Any, moves: list, ply: int) -> list:
+        """
+        Return moves of state, ply moves below the root, best first. Ties
+        keep the order of moves.
+
+        >>> orderer = MoveOrderer()
+        >>> orderer.record_cutoff(4, 1, 3)
+        >>> orderer.order(None, [1, 4, 9], 1)
+        [4, 1, 9]
+        """
+        tactics = tactical_scores(state) \
+            if isinstance(state, StonehengeState) else {}
+        killers = self.killers.get(ply, [])
+        history = self.history
+
+        def priority(move: Any) -> int:
+            """
+            Return the priority of move; higher is tried first.
+            """
+            score = tactics.get(move, 0) + history.get(move, 0)
+            if move in killers:
+                score += KILLER_BONUS
+            return score
+        return sorted(moves, key=priority, reverse=True)
+
+    def record_cutoff(self, move: Any, ply: int, depth: int) -> None:
+        """
+        Record that move caused a cutoff ply moves below the root, with about
+        depth moves left to play, which weighs the history entry.
+        """
+        killers = self.killers.setdefault(ply, [])
+        if move in killers:
+            killers.remove(move)
+        killers.insert(0, move)
+        del killers[KILLER_SLOTS:]
+        self.history[move] = self.history.get(move, 0) + depth * depth
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,194 @@
+"""
+A module for Stonehenge opening books.
+
+The first moves of a game are the most expensive to search and never change,
+so they are searched once, offline, and stored in a book. A book file holds
+the best move of every position up to some depth from the empty board, for
+each side length and first player it was built for:
+
+    magic b'SHOB', a varint entry count,
+    one 4-byte little-endian record offset per entry, sorted by key,
+    the records: varint key length, key, varint move length, move (UTF-8).
+
+Keys are the compact encoding of the positions (StonehengeState.to_bytes),
+so a lookup is a binary search over the offsets of the memory-mapped file.
+
+Usage:
+    python opening_book.py book.shob --sides 1 2 3 --depth 2 --strategy ab
+"""
+import argparse
+import mmap
+import struct
+from typing import Any, Callable, Dict, List
+from stonehenge_game import StonehengeGame, initial_state
+from stonehenge_state import StonehengeState
+from state_codec import write_varint, read_varint
+
+MAGIC = b'SHOB'
+
+
+def book_positions(side_length: int, p1_starts: bool,
+                   depth: int) -> List[StonehengeState]:
+    """
+    Return every unfinished position reachable in fewer than depth moves
+    from the empty board of side_length, without repeats.
+
+    >>> len(book_positions(2, True, 2))
+    8
+    """
+    start = initial_state(side_length, p1_starts)
+    seen = {start.to_bytes()}
+    layer = [start]
+    positions = []
+    for _ in range(depth):
+        positions.extend(layer)
+        next_layer = []
+        for state in layer:
+            for move in state.get_possible_moves():
+                child = state.make_move(move)
+                key = child.to_bytes()
+                if key not in seen and child.get_possible_moves():
+                    seen.add(key)
+                    next_layer.append(child)
+        layer = next_layer
+    return positions
+
+
+def build_book(side_lengths: List[int], depth: int,
+               strategy: Callable) -> Dict[bytes, str]:
+    """
+    Return the book entries for side_lengths up to depth, for both first
+    players, with each move picked by strategy.
+
+    >>> from strategy import minimax_recursive_strategy
+    >>> book = build_book([1], 1, minimax_recursive_strategy)
+    >>> sorted(book.values())
+    ['A', 'A']
+    """
+    entries = {}
+    for side_length in side_lengths:
+        for p1_starts in (True, False):
+            for state in book_positions(side_length, p1_starts, depth):
+                move = strategy(StonehengeGame.from_state(state))
+                entries[state.to_bytes()] = move
+    return entries
+
+
+def write_book(path: str, entries: Dict[bytes, str]) -> None:
+    """
+    Write entries, a dict from position keys to moves, to the book file at
+    path.
+    """
+    records = bytearray()
+    offsets = []
+    for key in sorted(entries):
+        offsets.append(len(records))
+        write_varint(len(key), records)
+        records.extend(key)
+        move = str(entries[key]).encode()
+        write_varint(len(move), records)
+        records.extend(move)
+    header = bytearray(MAGIC)
+    write_varint(len(offsets), header)
+    with open(path, 'wb') as book_file:
+        book_file.write(header)
+        book_file.write(struct.pack('<{}I'.format(len(offsets)), *offsets))
+        book_file.write(records)
+
+
+class OpeningBook:
+    """
+    A book file opened for lookups.
+
+    === Attributes ===
+    path: the book file.
+    """
+    path: str
+
+    def __init__(self, path: str) -> None:
+        """
+        Open the book file at path.
+        """
+        self.path = path
+        with open(path, 'rb') as book_file:
+            self._data = mmap.mmap(book_file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        if self._data[:4] != MAGIC:
+            raise ValueError("{} is not an opening book".format(path))
+        self._count, self._index = read_varint(self._data, 4)
+        self._records = self._index + 4 * self._count
+
+    def __len__(self) -> int:
+        """
+        Return the number of positions in this OpeningBook.
+        """
+        return self._count
+
+    def _record(self, number: int) -> tuple:
+        """
+        Return the key and move of record number.
+        """
+        offset = self._records + struct.unpack_from(
+            '<I', self._data, self._index + 4 * number)[0]
+        length, offset = read_varint(self._data, offset)
+        key = self._data[offset: offset + length]
+        length, offset = read_varint(self._data, offset + len(key))
+        return key, self._data[offset: offset + length].decode()
+
+    def lookup(self, state: Any) -> Any:
+        """
+        Return the book move of state, or None if state is not in the book.
+        """
+        if not isinstance(state, StonehengeState):
+            return None
+        key = state.to_bytes()
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            middle_key, move = self._record(middle)
+            if middle_key == key:
+                return move
+            if middle_key < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def close(self) -> None:
+        """
+        Close the book file.
+        """
+        self._data.close()
+
+
+def book_strategy(book: OpeningBook, fallback: Callable) -> Callable:
+    """
+    Return a strategy that plays the move of book when the current state is
+    in it and asks fallback otherwise.
+    """
+    def strategy(game: Any) -> Any:
+        """
+        Return the book move for game, or the move of fallback.
+        """
+        move = book.lookup(game.current_state)
+        if move is None:
+            return fallback(game)
+        return move
+    strategy.__name__ = 'book_' + getattr(fallback, '__name__', 'strategy')
+    return strategy
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build an opening book.")
+    parser.add_argument('path')
+    parser.add_argument('--sides', type=int, nargs='+', default=[1, 2, 3])
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--strategy', default='ab',
+                        help="key of usable_strategies used to search")
+    arguments = parser.parse_args()
+    from game_interface import usable_strategies
+    book_entries = build_book(arguments.sides, arguments.depth,
+                              usable_strategies[arguments.strategy])
+    write_book(arguments.path, book_entries)
+    print("Wrote {} positions to {}".format(len(book_entries),
+                                            arguments.path))
@@ -0,0 +1,252 @@
+"""
+A module for Monte Carlo tree search with several threads sharing one tree.
+
+Every thread runs the iterations of mcts_search on the same tree of Nodes.
+Walking down the tree, adding a node and crediting a result are quick and
+happen under one lock; the playout, where nearly all the time goes, runs
+outside it. While a thread's playout is running, every node on its path
+carries a virtual loss: it counts virtual_loss extra visits without any
+wins, so the other threads are steered to other branches instead of all
+piling into the same one. The virtual loss is taken back when the real
+result is credited.
+
+Threads only run playouts at the same time when the playout lets go of the
+GIL. The pure Python playout of mcts does not, so on a standard build of
+Python the threads mostly take turns; with NumPy installed a leaf can
+instead be scored by random_playouts of stonehenge_batch, which plays
+playouts random games at once in array operations that release the GIL. On
+a free-threaded build both kinds of playout run in parallel.
+
+Results depend on how the threads interleave, so unlike mcts_search a
+search with more than one thread is not repeatable.
+
+Usage:
+    python parallel_mcts.py --size 4 --iterations 2000 --threads 1 2 4 8
+    python parallel_mcts.py --size 5 --playouts 1 32
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from typing import Any, Callable, List, Optional
+from mcts import DEFAULT_ITERATIONS, EXPLORATION, Node, playout
+from move_cache import state_key
+from stonehenge_state import StonehengeState
+
+VIRTUAL_LOSS = 1
+DEFAULT_PLAYOUTS = 16
+
+
+def numpy_playout(count: int) -> Optional[Callable]:
+    """
+    Return a playout that scores a Stonehenge state by the mean result of
+    count random games played at once with NumPy, or None without NumPy.
+    """
+    try:
+        import numpy as np
+        from stonehenge_batch import random_playouts
+    except ImportError:  # NumPy is not installed
+        return None
+
+    def batch_playout(game: Any, state: Any, rng: random.Random) -> float:
+        """
+        Return the mean result of count random games from state for the
+        player to move at state.
+        """
+        if not isinstance(state, StonehengeState):
+            return playout(game, state, rng)
+        generator = np.random.default_rng(rng.getrandbits(64))
+        return float(random_playouts(state, count, generator).mean())
+    return batch_playout
+
+
+class ParallelSearch:
+    """
+    A Monte Carlo tree search shared by several threads.
+
+    === Attributes ===
+    game: the game whose current state is searched.
+    root: the root of the shared tree.
+    iterations: the number of iterations to run in all.
+    exploration: the exploration constant of UCT.
+    virtual_loss: the visits without wins added to a path while its
+    playout runs.
+    playout: the function scoring a leaf for its player to move.
+    started: the number of iterations started so far.
+    playouts_run: the number of random games played so far.
+    """
+    game: Any
+    root: Node
+    iterations: int
+    exploration: float
+    virtual_loss: int
+    playout: Callable
+    started: int
+    playouts_run: int
+
+    def __init__(self, game: Any, iterations: int = DEFAULT_ITERATIONS,
+                 exploration: float = EXPLORATION,
+                 virtual_loss: int = VIRTUAL_LOSS,
+                 playout_function: Callable = playout,
+                 games_per_playout: int = 1) -> None:
+        """
+        Initialize a ParallelSearch of game for iterations iterations, each
+        scored by playout_function, which plays games_per_playout games.
+        """
+        self.game = game
+        self.root = Node(game.current_state)
+        if isinstance(self.root.state, StonehengeState):
+            self.root.state.threats()
+        self.iterations = iterations
+        self.exploration = exploration
+        self.virtual_loss = virtual_loss
+        self.playout = playout_function
+        self.started = 0
+        self.playouts_run = 0
+        self._games_per_playout = games_per_playout
+        self._lock = threading.Lock()
+        self._rng = random.Random(state_key(self.root.state))
+
+    def _select(self) -> Optional[List[Node]]:
+        """
+        Return the path from the root to a new leaf, with a virtual loss
+        added along it, or None once every iteration has started. Called
+        with the lock held.
+        """
+        if self.started >= self.iterations:
+            return None
+        self.started += 1
+        node = self.root
+        path = [node]
+        while not node.untried and node.children:
+            node = node.uct_child(self.exploration)
+            path.append(node)
+        if node.untried and not self.game.is_over(node.state):
+            node = node.expand(self._rng)
+            path.append(node)
+        for visited in path:
+            visited.visits += self.virtual_loss
+        return path
+
+    def _credit(self, path: List[Node], result: float) -> None:
+        """
+        Take back the virtual loss of path and credit result, the score for
+        the player who moved into its last node. Called with the lock held.
+        """
+        for node in reversed(path):
+            node.visits += 1 - self.virtual_loss
+            node.wins += (result + 1) / 2
+            result = -result
+        self.playouts_run += self._games_per_playout
+
+    def work(self, seed: int) -> None:
+        """
+        Run iterations until all of them have started, drawing playouts
+        from a random generator seeded with seed.
+        """
+        rng = random.Random(seed)
+        while True:
+            with self._lock:
+                path = self._select()
+            if path is None:
+                return
+            result = -self.playout(self.game, path[-1].state, rng)
+            with self._lock:
+                self._credit(path, result)
+
+    def run(self, threads: int) -> Node:
+        """
+        Run the search on threads threads and return the root.
+
+        >>> from stonehenge_game import StonehengeGame
+        >>> state = StonehengeState(True, 2, ['1', 'B', 'C', 'D', 'E', 'F',
+        ...                                   'G'])
+        >>> search = ParallelSearch(StonehengeGame.from_state(state), 60)
+        >>> root = search.run(3)
+        >>> root.visits, sum(child.visits for child in root.children)
+        (60, 60)
+        """
+        seed = self._rng.getrandbits(32)
+        workers = [threading.Thread(target=self.work, args=(seed + index,))
+                   for index in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return self.root
+
+    def best_move(self) -> Any:
+        """
+        Return the most visited move of the root.
+        """
+        return max(self.root.children, key=lambda child: child.visits).move
+
+
+def parallel_mcts_search(game: Any, iterations: int = DEFAULT_ITERATIONS,
+                         threads: int = 4, playouts: int = 1,
+                         virtual_loss: int = VIRTUAL_LOSS) -> ParallelSearch:
+    """
+    Return a finished ParallelSearch of game on threads threads, scoring
+    every leaf with playouts random games: the playout of mcts if playouts
+    is 1, or random_playouts with NumPy (falling back to one Python playout
+    without it).
+    """
+    function = numpy_playout(playouts) if playouts > 1 else None
+    if function is None:
+        function, playouts = playout, 1
+    search = ParallelSearch(game, iterations, EXPLORATION, virtual_loss,
+                            function, playouts)
+    search.run(threads)
+    return search
+
+
+def parallel_mcts_strategy(game: Any) -> Any:
+    """
+    Return the most visited move of a Monte Carlo tree search of game shared
+    by one thread per processor, with NumPy batch playouts when available.
+
+    >>> from stonehenge_game import StonehengeGame
+    >>> state = StonehengeState(False, 2, ['A', 'B', '2', '1', 'E', 'F', '1'])
+    >>> parallel_mcts_strategy(StonehengeGame.from_state(state))
+    'B'
+    """
+    return parallel_mcts_search(game, DEFAULT_ITERATIONS,
+                                max(2, os.cpu_count() or 1),
+                                DEFAULT_PLAYOUTS).best_move()
+
+
+def benchmark(side_length: int, iterations: int, threads: int,
+              playouts: int) -> float:
+    """
+    Return the random games per second played by a search from the empty
+    board of side_length.
+    """
+    from stonehenge_game import StonehengeGame
+    start = time.perf_counter()
+    search = parallel_mcts_search(StonehengeGame.create(side_length),
+                                  iterations, threads, playouts)
+    return search.playouts_run / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Random games per second of parallel tree search.")
+    parser.add_argument('--size', type=int, default=4)
+    parser.add_argument('--iterations', type=int, default=1000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--playouts', type=int, nargs='+',
+                        default=[1, DEFAULT_PLAYOUTS],
+                        help="random games per leaf; 1 is the Python playout")
+    arguments = parser.parse_args()
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print("side {}, {} iterations, {} processors, GIL {}".format(
+        arguments.size, arguments.iterations, os.cpu_count(),
+        'enabled' if gil else 'disabled'))
+    print("{:>8}{:>10}{:>14}".format('threads', 'playouts', 'games/s'))
+    for games in arguments.playouts:
+        for count in arguments.threads:
+            print("{:>8}{:>10}{:>14.0f}".format(
+                count, games, benchmark(arguments.size, arguments.iterations,
+                                        count, games)))
@@ -0,0 +1,212 @@
+"""
+A module for perft, a node counting tool for our games.
+
+perft walks the whole game tree of a state down to a fixed depth and counts
+its leaves. Two move generators that agree on every perft count produce the
+same tree, so it is used to check that faster versions of get_possible_moves
+and make_move are still correct, and to measure how fast they are.
+
+Usage:
+    python perft.py h 3 --depth 4
+    python perft.py s 40 --depth 6 --divide
+    python perft.py h 2 --depth 5 --compare my_engine:initial_state
+"""
+import argparse
+import importlib
+import time
+from typing import Any, Callable, Dict, List
+from stonehenge_game import StonehengeGame
+from substract_square_game import SubstractSquareGame
+
+
+def initial_state(game: str, size: int, p1_starts: bool = True) -> Any:
+    """
+    Return the starting state of game, where game is 'h' for Stonehenge
+    (size is the side length) or 's' for Subtract Square (size is the
+    starting number).
+
+    >>> initial_state('h', 1).cells
+    ['A', 'B', 'C']
+    >>> initial_state('s', 10).number
+    10
+    """
+    if game == 'h':
+        return StonehengeGame.create(size, p1_starts).current_state
+    if game == 's':
+        return SubstractSquareGame.create(size, p1_starts).current_state
+    raise ValueError("Unknown game: {}".format(game))
+
+
+def perft(state: Any, depth: int) -> int:
+    """
+    Return the number of leaves of the game tree of state cut off at depth.
+    A state that is over before depth is reached counts as one leaf.
+
+    >>> perft(initial_state('h', 1), 1)
+    3
+    >>> perft(initial_state('s', 5), 2)
+    3
+    """
+    if depth == 0:
+        return 1
+    moves = state.get_possible_moves()
+    if not moves:
+        return 1
+    if depth == 1:
+        return len(moves)
+    return sum(perft(state.make_move(move), depth - 1) for move in moves)
+
+
+def perft_divide(state: Any, depth: int) -> Dict[Any, int]:
+    """
+    Return the perft count below each move of state, in move order.
+
+    >>> perft_divide(initial_state('s', 5), 2)
+    {1: 2, 4: 1}
+    """
+    return {move: perft(state.make_move(move), depth - 1)
+            for move in state.get_possible_moves()}
+
+
+class PerftResult:
+    """
+    The outcome of a timed perft run.
+
+    === Attributes ===
+    depth: the depth the tree was searched to.
+    nodes: the number of leaves counted.
+    seconds: the wall clock time the count took.
+    """
+    depth: int
+    nodes: int
+    seconds: float
+
+    def __init__(self, depth: int, nodes: int, seconds: float) -> None:
+        """
+        Initialize a PerftResult.
+        """
+        self.depth = depth
+        self.nodes = nodes
+        self.seconds = seconds
+
+    def nodes_per_second(self) -> float:
+        """
+        Return the number of leaves counted per second.
+
+        >>> PerftResult(3, 100, 0.5).nodes_per_second()
+        200.0
+        """
+        if self.seconds <= 0:
+            return float('inf')
+        return self.nodes / self.seconds
+
+    def __str__(self) -> str:
+        """
+        Return a one line report of this PerftResult.
+
+        >>> print(PerftResult(3, 100, 0.5))
+        depth 3: 100 nodes in 0.500s (200 nodes/s)
+        """
+        return "depth {}: {} nodes in {:.3f}s ({:.0f} nodes/s)".format(
+            self.depth, self.nodes, self.seconds, self.nodes_per_second())
+
+
+def run_perft(state: Any, depth: int) -> PerftResult:
+    """
+    Return a timed perft count of state to depth.
+
+    >>> run_perft(initial_state('h', 1), 2).nodes
+    3
+    """
+    start = time.perf_counter()
+    nodes = perft(state, depth)
+    return PerftResult(depth, nodes, time.perf_counter() - start)
+
+
+def compare_perft(reference: Any, candidate: Any, depth: int,
+                  path: tuple = ()) -> List[str]:
+    """
+    Return a list of differences between the game trees of reference and
+    candidate to depth. Each difference names the move sequence leading to
+    the first position where the two engines disagree, so an empty list means
+    both trees are identical.
+
+    >>> compare_perft(initial_state('s', 30), initial_state('s', 30), 3)
+    []
+    >>> compare_perft(initial_state('s', 9), initial_state('s', 10), 2)
+    ['[1]: moves [1, 4] vs [1, 4, 9]', '[9]: moves [] vs [1]']
+    """
+    if depth == 0:
+        return []
+    ref_moves = reference.get_possible_moves()
+    cand_moves = candidate.get_possible_moves()
+    if sorted(map(str, ref_moves)) != sorted(map(str, cand_moves)):
+        return ["{}: moves {} vs {}".format(list(path), ref_moves,
+                                             cand_moves)]
+    ref_count = perft(reference, depth)
+    cand_count = perft(candidate, depth)
+    if ref_count == cand_count:
+        return []
+    differences = []
+    for move in ref_moves:
+        differences.extend(compare_perft(reference.make_move(move),
+                                         candidate.make_move(move),
+                                         depth - 1, path + (move,)))
+    if not differences:
+        differences.append("{}: {} nodes vs {} nodes".format(
+            list(path), ref_count, cand_count))
+    return differences
+
+
+def load_engine(spec: str) -> Callable[[str, int, bool], Any]:
+    """
+    Return the function named by spec, written as 'module:function'. The
+    function takes the same arguments as initial_state and returns the root
+    state of the alternative engine.
+
+    >>> load_engine('perft:initial_state') is initial_state
+    True
+    """
+    module_name, _, function_name = spec.partition(':')
+    return getattr(importlib.import_module(module_name),
+                   function_name or 'initial_state')
+
+
+def main(argv: Any = None) -> None:
+    """
+    Run perft from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Count game tree leaves.")
+    parser.add_argument('game', choices=['h', 's'],
+                        help="'h' for Stonehenge, 's' for Subtract Square")
+    parser.add_argument('size', type=int,
+                        help="side length or starting number")
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--p2-starts', action='store_true')
+    parser.add_argument('--divide', action='store_true',
+                        help="print the count below each root move")
+    parser.add_argument('--compare', metavar='MODULE:FUNCTION',
+                        help="diff the tree against another engine")
+    args = parser.parse_args(argv)
+
+    state = initial_state(args.game, args.size, not args.p2_starts)
+    for depth in range(1, args.depth + 1):
+        print(run_perft(state, depth))
+    if args.divide:
+        for move, count in perft_divide(state, args.depth).items():
+            print("{}: {}".format(move, count))
+    if args.compare:
+        other = load_engine(args.compare)(args.game, args.size,
+                                          not args.p2_starts)
+        start = time.perf_counter()
+        differences = compare_perft(state, other, args.depth)
+        print("{}: {:.3f}s".format(args.compare,
+                                   time.perf_counter() - start))
+        for difference in differences:
+            print(difference)
+        if not differences:
+            print("Trees match to depth {}.".format(args.depth))
+
+
+if __name__ == "__main__":
+    main()
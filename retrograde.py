@@ -0,0 +1,229 @@
+"""
+A module for solving games whose states can repeat, such as Chopsticks.
+
+Minimax never terminates on a game with cycles. Retrograde analysis instead
+builds the whole graph of states reachable from a start state once, then
+works backwards from the finished states: a state is won if some move leads
+to a lost state, and lost once every move leads to a won state. States that
+are never resolved this way can be held forever by both players, so they are
+draws.
+"""
+from collections import deque
+from typing import Any, Callable, Dict, List
+from move_cache import state_key
+
+
+def value_key(state: Any) -> bytes:
+    """
+    Return the state_key of state, so equal states share a key.
+
+    >>> from state_of_game import SubstractSquareState
+    >>> value_key(SubstractSquareState(True, 5)) == \\
+    ...     value_key(SubstractSquareState(True, 5))
+    True
+    >>> value_key(object())
+    Traceback (most recent call last):
+    ...
+    ValueError: object states have no value-based key
+    """
+    key = state_key(state)
+    if key is None:
+        raise ValueError("{} states have no value-based key".format(
+            type(state).__name__))
+    return key
+
+
+class RetrogradeSolver:
+    """
+    The solved values of every state reachable from a start state.
+
+    === Attributes ===
+    index: the number of each state, keyed by key(state), value_key unless
+    another key is given.
+    states: the states in index order.
+    moves: the moves of each state, in get_possible_moves order.
+    children: the index of the state each move of each state leads to.
+    values: the score of each state for the player to move: 1, -1 or 0.
+    distances: the number of moves to the end of the game with best play,
+    for won and lost states.
+    """
+    index: Dict[Any, int]
+    states: List[Any]
+    moves: List[list]
+    children: List[List[int]]
+    values: List[int]
+    distances: List[int]
+
+    def __init__(self, game: Any,
+                 key: Callable[[Any], Any] = value_key) -> None:
+        """
+        Build and solve the state graph of game from its current state.
+        States are identified by key(state).
+
+        >>> from substract_square_game import ChopsticksGame
+        >>> solver = RetrogradeSolver(ChopsticksGame(True))
+        >>> len(solver.states) > 0
+        True
+        >>> from substract_square_game import SubstractSquareGame
+        >>> len(RetrogradeSolver(SubstractSquareGame.create(30)).states)
+        58
+        """
+        self.key = key
+        self.index = {}
+        self.states = []
+        self.moves = []
+        self.children = []
+        self._explore(game.current_state)
+        self._solve(game)
+
+    def _explore(self, start: Any) -> None:
+        """
+        Number every state reachable from start and record its moves.
+        """
+        self.index[self.key(start)] = 0
+        self.states.append(start)
+        queue = deque([0])
+        while queue:
+            number = queue.popleft()
+            state = self.states[number]
+            moves = state.get_possible_moves()
+            children = []
+            for move in moves:
+                child = state.make_move(move)
+                child_key = self.key(child)
+                if child_key not in self.index:
+                    self.index[child_key] = len(self.states)
+                    self.states.append(child)
+                    queue.append(self.index[child_key])
+                children.append(self.index[child_key])
+            self.moves.append(list(moves))
+            self.children.append(children)
+
+    def _terminal_value(self, game: Any, state: Any) -> int:
+        """
+        Return the score of the finished state for its player to move.
+        """
+        old_state = game.current_state
+        game.current_state = state
+        if game.is_winner(state.get_current_player_name()):
+            value = 1
+        elif game.is_winner('p1') or game.is_winner('p2'):
+            value = -1
+        else:
+            value = 0
+        game.current_state = old_state
+        return value
+
+    def _solve(self, game: Any) -> None:
+        """
+        Propagate the values of the finished states back to every state.
+        """
+        size = len(self.states)
+        parents: List[List[int]] = [[] for _ in range(size)]
+        for number, children in enumerate(self.children):
+            for child in children:
+                parents[child].append(number)
+        self.values = [0] * size
+        self.distances = [0] * size
+        resolved = [False] * size
+        unresolved_moves = [len(children) for children in self.children]
+        queue = deque()
+        for number in range(size):
+            if not self.children[number] or \
+                    game.is_over(self.states[number]):
+                self.values[number] = self._terminal_value(
+                    game, self.states[number])
+                resolved[number] = True
+                queue.append(number)
+
+        # States are resolved in order of distance, so a won state gets the
+        # shortest win and a lost state the longest defence.
+        while queue:
+            number = queue.popleft()
+            value = self.values[number]
+            for parent in parents[number]:
+                if resolved[parent]:
+                    continue
+                if value == -1:
+                    self.values[parent] = 1
+                elif value == 1:
+                    unresolved_moves[parent] -= 1
+                    if unresolved_moves[parent] > 0:
+                        continue
+                    self.values[parent] = -1
+                else:
+                    continue
+                self.distances[parent] = self.distances[number] + 1
+                resolved[parent] = True
+                queue.append(parent)
+
+    def value(self, state: Any) -> int:
+        """
+        Return the score of state for its player to move.
+
+        >>> from substract_square_game import ChopsticksGame
+        >>> game = ChopsticksGame(True)
+        >>> RetrogradeSolver(game).value(game.current_state) in (-1, 0, 1)
+        True
+        """
+        return self.values[self.index[self.key(state)]]
+
+    def best_move(self, state: Any) -> Any:
+        """
+        Return the best move from state: the fastest win, the longest defence
+        when every move loses, and otherwise a move that keeps the draw.
+        """
+        number = self.index[self.key(state)]
+        best_move = None
+        best = None
+        for move, child in zip(self.moves[number], self.children[number]):
+            value = -self.values[child]
+            if value == 1:
+                rank = (value, -self.distances[child])
+            elif value == -1:
+                rank = (value, self.distances[child])
+            else:
+                rank = (value, 0)
+            if best is None or rank > best:
+                best = rank
+                best_move = move
+        return best_move
+
+
+_SOLVERS: List[RetrogradeSolver] = []
+
+
+def retrograde_strategy(game: Any) -> Any:
+    """
+    Return the best move for game from a retrograde analysis of every state
+    reachable from its current state. The analysis is built once and reused
+    for every later state it covers, so it suits games with few states
+    (Chopsticks, small Subtract Square numbers) and also works when states
+    repeat.
+
+    >>> from substract_square_game import ChopsticksGame
+    >>> game = ChopsticksGame(True)
+    >>> retrograde_strategy(game) in game.current_state.get_possible_moves()
+    True
+    >>> from substract_square_game import SubstractSquareGame
+    >>> game = SubstractSquareGame.create(30)
+    >>> solvers = len(_SOLVERS)
+    >>> game.current_state = game.current_state.make_move(
+    ...     retrograde_strategy(game))
+    >>> _ = retrograde_strategy(game)
+    >>> len(_SOLVERS) - solvers
+    1
+    """
+    state = game.current_state
+    for solver in _SOLVERS:
+        if type(solver.states[0]) == type(state) and \
+                solver.key(state) in solver.index:
+            return solver.best_move(state)
+    solver = RetrogradeSolver(game)
+    _SOLVERS.append(solver)
+    return solver.best_move(state)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
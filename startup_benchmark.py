@@ -0,0 +1,109 @@
+"""
+A module for measuring how long the game interface takes to start.
+
+Every run starts a fresh interpreter, so nothing is imported or cached yet,
+and times four phases: importing game_interface, looking up the chosen game
+and strategy (which imports their modules), building the board tables of
+the game (the Stonehenge geometry and drawing template) and making the
+first move. The median of every phase over all runs is reported, along
+with the number of modules the run had imported.
+
+Usage:
+    python startup_benchmark.py h 3 mr --runs 10
+    python startup_benchmark.py s 20 ab
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+PHASES = ('import', 'load', 'tables', 'first_move')
+
+
+def measure(game: str, size: int, strategy: str) -> Dict[str, Any]:
+    """
+    Return the seconds taken by each phase of starting game of size and
+    making a move with strategy in this interpreter, and the number of
+    modules imported.
+
+    >>> result = measure('s', 5, 'mr')
+    >>> sorted(result)
+    ['first_move', 'import', 'load', 'modules', 'tables']
+    """
+    start = time.perf_counter()
+    from game_interface import playable_games, usable_strategies
+    imported = time.perf_counter()
+    game_class = playable_games[game]
+    chosen = usable_strategies[strategy]
+    loaded = time.perf_counter()
+    if game == 'h':
+        from stonehenge_geometry import get_geometry
+        from stonehenge_render import compile_template
+        get_geometry(size)
+        compile_template(size)
+    tables = time.perf_counter()
+    chosen(game_class.create(size))
+    moved = time.perf_counter()
+    return {'import': imported - start, 'load': loaded - imported,
+            'tables': tables - loaded, 'first_move': moved - tables,
+            'modules': len(sys.modules)}
+
+
+def run(game: str, size: int, strategy: str, runs: int) -> List[dict]:
+    """
+    Return the measurements of runs fresh interpreters.
+    """
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, __file__, game, str(size), strategy, '--child'],
+            check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.splitlines()[-1]))
+    return results
+
+
+def summary(results: List[dict]) -> str:
+    """
+    Return the median of every phase of results, in milliseconds.
+
+    >>> print(summary([{'import': 0.01, 'load': 0.005, 'tables': 0.0,
+    ...                 'first_move': 0.002, 'modules': 80}]))
+    import         10.00 ms
+    load            5.00 ms
+    tables          0.00 ms
+    first_move      2.00 ms
+    total          17.00 ms
+    modules loaded: 80
+    """
+    lines = []
+    total = 0.0
+    for phase in PHASES:
+        median = statistics.median(result[phase] for result in results)
+        total += median
+        lines.append("{:<12}{:>8.2f} ms".format(phase, median * 1000))
+    lines.append("{:<12}{:>8.2f} ms".format('total', total * 1000))
+    lines.append("modules loaded: {}".format(
+        statistics.median(result['modules'] for result in results)))
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the start of a game.")
+    parser.add_argument('game', choices=['h', 's'],
+                        help="'h' for Stonehenge, 's' for Subtract Square")
+    parser.add_argument('size', type=int,
+                        help="side length or starting number")
+    parser.add_argument('strategy', help="key of usable_strategies")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--child', action='store_true',
+                        help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+    if arguments.child:
+        print(json.dumps(measure(arguments.game, arguments.size,
+                                 arguments.strategy)))
+    else:
+        print(summary(run(arguments.game, arguments.size, arguments.strategy,
+                          arguments.runs)))
@@ -0,0 +1,115 @@
+"""
+A module for the compact binary encoding of game states.
+
+Every state class that supports the encoding has a write_to method, which
+appends the state to a bytearray, and a read_from class method, which
+decodes a state starting at an offset of a buffer. Encoded states are
+self-delimiting, so many of them can be packed back to back into one buffer
+and decoded again without copying through a memoryview.
+"""
+from typing import Any, Iterator, List, Tuple
+
+
+def write_varint(value: int, out: bytearray) -> None:
+    """
+    Append the non-negative int value to out as a little-endian base-128
+    varint.
+
+    >>> out = bytearray()
+    >>> write_varint(300, out)
+    >>> bytes(out)
+    b'\\xac\\x02'
+    """
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data: Any, offset: int) -> Tuple[int, int]:
+    """
+    Return the varint stored in data at offset, and the offset just past it.
+
+    >>> read_varint(b'\\xac\\x02', 0)
+    (300, 2)
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def write_2bit(values: List[int], out: bytearray) -> None:
+    """
+    Append values, each in range(4), to out packed four to a byte.
+
+    >>> out = bytearray()
+    >>> write_2bit([1, 2, 0, 3, 1], out)
+    >>> list(out)
+    [201, 1]
+    """
+    for start in range(0, len(values), 4):
+        byte = 0
+        for shift, value in enumerate(values[start: start + 4]):
+            byte |= value << (2 * shift)
+        out.append(byte)
+
+
+def read_2bit(data: Any, offset: int, count: int) -> Tuple[List[int], int]:
+    """
+    Return count values packed by write_2bit from data at offset, and the
+    offset just past them.
+
+    >>> read_2bit(bytes([201, 1]), 0, 5)
+    ([1, 2, 0, 3, 1], 2)
+    """
+    values = []
+    for i in range(count):
+        values.append((data[offset + i // 4] >> (2 * (i % 4))) & 3)
+    return values, offset + (count + 3) // 4
+
+
+def encode_states(states: Any, out: Any = None) -> bytearray:
+    """
+    Return a bytearray with all of states encoded back to back. If out is
+    given the states are appended to it instead of a new bytearray.
+
+    >>> from state_of_game import SubstractSquareState
+    >>> data = encode_states([SubstractSquareState(True, 30),
+    ...                       SubstractSquareState(False, 1000)])
+    >>> len(data)
+    3
+    """
+    if out is None:
+        out = bytearray()
+    for state in states:
+        state.write_to(out)
+    return out
+
+
+def decode_states(data: Any, state_class: Any) -> Iterator[Any]:
+    """
+    Yield the states of state_class encoded back to back in data, which can
+    be bytes, a bytearray or a memoryview.
+
+    >>> from state_of_game import SubstractSquareState
+    >>> data = encode_states([SubstractSquareState(True, 30),
+    ...                       SubstractSquareState(False, 1000)])
+    >>> [str(s) for s in decode_states(data, SubstractSquareState)]
+    ['The current value is: 30', 'The current value is: 1000']
+    """
+    view = memoryview(data)
+    offset = 0
+    while offset < len(view):
+        state, offset = state_class.read_from(view, offset)
+        yield state
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -3,8 +3,10 @@ State of game module.
 classes State, SubstractSquareState and ChopsticsState.
 """
 
+import math
 from typing import Any
 from typing import List
+from state_codec import write_varint, read_varint
 
 
 class State:
@@ -191,8 +193,13 @@ class SubstractSquareState(State):
         True
         >>> a.is_valid_move(9)
         False
+        >>> a.is_valid_move(3), a.is_valid_move('1')
+        (False, False)
         """
-        return move_to_make in self.valid_moves
+        # A square no larger than number, checked without the move list.
+        return isinstance(move_to_make, int) and \
+            0 < move_to_make <= self.number and \
+            math.isqrt(move_to_make) ** 2 == move_to_make
 
     def make_move(self, move_to_make: int) -> State:
         """
@@ -228,6 +235,54 @@ class SubstractSquareState(State):
         """
         return self.number == 0
 
+    def write_to(self, out: bytearray) -> None:
+        """
+        Append the compact binary encoding of SubstractSquareState self to
+        out: one varint holding the number and whose turn it is.
+
+        >>> out = bytearray()
+        >>> SubstractSquareState(True, 30).write_to(out)
+        >>> list(out)
+        [61]
+        """
+        write_varint(self.number << 1 | self.is_p1_turn, out)
+
+    def to_bytes(self) -> bytes:
+        """
+        Return the compact binary encoding of SubstractSquareState self.
+
+        :rtype: bytes
+
+        >>> SubstractSquareState(False, 1000).to_bytes()
+        b'\\xd0\\x0f'
+        """
+        out = bytearray()
+        self.write_to(out)
+        return bytes(out)
+
+    @classmethod
+    def read_from(cls, data: Any, offset: int) -> tuple:
+        """
+        Return the SubstractSquareState encoded in data at offset by write_to,
+        and the offset just past it.
+
+        >>> SubstractSquareState.read_from(b'\\x00=', 1)[1]
+        2
+        """
+        value, offset = read_varint(data, offset)
+        return cls(bool(value & 1), value >> 1), offset
+
+    @classmethod
+    def from_bytes(cls, data: Any) -> 'SubstractSquareState':
+        """
+        Return the SubstractSquareState encoded in data by to_bytes.
+
+        >>> a = SubstractSquareState(False, 1000)
+        >>> SubstractSquareState.from_bytes(a.to_bytes()) == a
+        True
+        """
+        return cls.read_from(data, 0)[0]
+
 
 class ChopsticsState(State):
     """
@@ -278,10 +333,48 @@ class ChopsticsState(State):
         True
         >>> a == b
         False
+        >>> a == a.make_move('ll')
+        False
         """
         return self.is_p1_turn == other.is_p1_turn and \
-               type(self) == type(other) and self.p1 == self.p1 \
-               and self.p2 == self.p2
+               type(self) == type(other) and self.p1 == other.p1 \
+               and self.p2 == other.p2
+
+    def __hash__(self) -> int:
+        """
+        Return a hash of ChopsticsState self, consistent with __eq__.
+
+        :rtype: int
+
+        >>> hash(ChopsticsState(True)) == hash(ChopsticsState(True))
+        True
+        """
+        return hash((self.is_p1_turn, tuple(self.p1), tuple(self.p2)))
+
+    def __repr__(self) -> str:
+        """
+        Return a representation of ChopsticsState self (which can be used for
+        equality testing).
+
+        :rtype: str
+
+        >>> ChopsticsState(True)
+        ChopsticsState(p1 turn: True, p1: [1, 1], p2: [1, 1])
+        """
+        return "ChopsticsState(p1 turn: {}, p1: {}, p2: {})".format(
+            self.is_p1_turn, self.p1, self.p2)
+
+    def game_over(self) -> bool:
+        """
+        Return whether the game is over, which happens once both hands of a
+        player are out.
+
+        :rtype: bool
+
+        >>> ChopsticsState(True).game_over()
+        False
+        """
+        return self.p1 == [0, 0] or self.p2 == [0, 0]
 
     def __str__(self) -> str:
         """
@@ -0,0 +1,339 @@
+"""
+A module for evaluating many Stonehenge positions at once with NumPy.
+
+A batch of N positions of one side length is an N x num_cells int8 array of
+boards (0 for an unclaimed cell, 1 or 2 for the player who claimed it) and,
+optionally, an N x num_lines int8 array of the markers already captured
+before the last move (0 for '@'). Ley-line counts come from one matrix
+product with the cell/ley-line incidence matrix of the board, so a whole ply
+is evaluated without building a StonehengeState per position.
+
+random_winners plays many random games at once the same way, from one
+position or many: every game is a row of the boards, and one move of every
+game is a handful of array operations, during which NumPy does not hold the
+GIL. batch_playouts turns the winners into a win rate per starting
+position, which rollout_strategy uses to score every move of a position
+with a single call.
+"""
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from move_cache import state_key
+from stonehenge_geometry import get_geometry
+from stonehenge_state import StonehengeState
+
+DEFAULT_ROLLOUTS = 256
+_INCIDENCE: Dict[int, np.ndarray] = {}
+
+
+def incidence_matrix(side_length: int) -> np.ndarray:
+    """
+    Return the num_cells x num_lines matrix whose entry [c, m] is 1 when
+    cell c lies on the ley-line of marker m. Lines are in marker order.
+
+    >>> incidence_matrix(1).tolist()
+    [[1, 0, 1, 0, 0, 1], [0, 1, 1, 0, 1, 0], [0, 1, 0, 1, 0, 1]]
+    """
+    if side_length not in _INCIDENCE:
+        geometry = get_geometry(side_length)
+        matrix = np.zeros((geometry.num_cells, len(geometry.lines)),
+                          dtype=np.int16)
+        for cell, markers in enumerate(geometry.cell_lines):
+            matrix[cell, markers] = 1
+        _INCIDENCE[side_length] = matrix
+    return _INCIDENCE[side_length]
+
+
+def encode_state(state: StonehengeState) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the board and marker arrays of state.
+
+    >>> board, markers = encode_state(StonehengeState(
+    ...     True, 1, ['A', 'B', 'C']).make_move('B'))
+    >>> board.tolist(), markers.tolist()
+    ([0, 1, 0], [0, 1, 1, 0, 1, 0])
+    """
+    board = np.array([int(cell) if str(cell).isdigit() else 0
+                      for cell in state.cells], dtype=np.int8)
+    markers = np.array([0 if marker == '@' else marker
+                        for marker in state.marker], dtype=np.int8)
+    return board, markers
+
+
+def encode_children(state: StonehengeState) -> Tuple[List[Any], np.ndarray,
+                                                     np.ndarray]:
+    """
+    Return the moves of state with the boards and markers of the states they
+    lead to, one row per move. The markers are those of state, which is what
+    evaluate expects for positions one move after them.
+
+    >>> moves, boards, markers = encode_children(
+    ...     StonehengeState(True, 1, ['A', 'B', 'C']))
+    >>> moves, boards.tolist()
+    (['A', 'B', 'C'], [[1, 0, 0], [0, 1, 0], [0, 0, 1]])
+    """
+    board, markers = encode_state(state)
+    moves = state.get_possible_moves()
+    boards = np.repeat(board[np.newaxis, :], len(moves), axis=0)
+    player = 1 if state.p1_turn else 2
+    cells = [state.cells.index(move) for move in moves]
+    boards[np.arange(len(moves)), cells] = player
+    return moves, boards, np.repeat(markers[np.newaxis, :], len(moves),
+                                    axis=0)
+
+
+class BatchEvaluation:
+    """
+    The evaluation of a batch of Stonehenge positions.
+
+    === Attributes ===
+    counts: an N x 2 x num_lines array of the cells each player holds on
+    each ley-line.
+    markers: an N x num_lines array of captured markers (0, 1 or 2).
+    captured: an N x 2 array of the markers each player has captured.
+    game_over: an N array of whether each position is over.
+    winner: an N array of the winner of each position (0 if not over).
+    scores: an N array of heuristic scores in [-1, 1] from p1's point of
+    view; finished positions score exactly 1 or -1.
+    """
+    counts: np.ndarray
+    markers: np.ndarray
+    captured: np.ndarray
+    game_over: np.ndarray
+    winner: np.ndarray
+    scores: np.ndarray
+
+    def __init__(self, side_length: int, boards: np.ndarray,
+                 markers: Any = None) -> None:
+        """
+        Evaluate boards, a batch of positions of side_length whose markers
+        before the last move were markers (all '@' if None).
+        """
+        geometry = get_geometry(side_length)
+        incidence = incidence_matrix(side_length)
+        boards = np.atleast_2d(boards)
+        counts1 = (boards == 1).astype(np.int16) @ incidence
+        counts2 = (boards == 2).astype(np.int16) @ incidence
+        self.counts = np.stack([counts1, counts2], axis=1)
+
+        thresholds = np.array(geometry.line_thresholds, dtype=np.int16)
+        if markers is None:
+            markers = np.zeros(counts1.shape, dtype=np.int8)
+        markers = np.atleast_2d(markers)
+        # Unclaimed lines are awarded the same way StonehengeState does it:
+        # p1 is checked before p2.
+        new_markers = np.where(counts1 >= thresholds, 1,
+                               np.where(counts2 >= thresholds, 2, 0))
+        self.markers = np.where(markers != 0, markers,
+                                new_markers).astype(np.int8)
+        self.captured = np.stack([(self.markers == 1).sum(axis=1),
+                                  (self.markers == 2).sum(axis=1)], axis=1)
+
+        p1_wins = self.captured[:, 0] >= geometry.win_threshold
+        p2_wins = self.captured[:, 1] >= geometry.win_threshold
+        self.game_over = p1_wins | p2_wins
+        self.winner = np.where(p1_wins, 1, np.where(p2_wins, 2, 0))
+
+        # An open line counts for the player closer to claiming it, weighted
+        # by how close they are, on top of a full point per captured line.
+        open_lines = self.markers == 0
+        pressure = ((counts1 - counts2) / thresholds) * open_lines
+        num_lines = len(geometry.lines)
+        heuristic = ((self.captured[:, 0] - self.captured[:, 1]) +
+                     0.5 * pressure.sum(axis=1)) / (num_lines + 1)
+        self.scores = np.where(p1_wins, 1.0,
+                               np.where(p2_wins, -1.0, heuristic))
+
+
+def evaluate(side_length: int, boards: np.ndarray,
+             markers: Any = None) -> BatchEvaluation:
+    """
+    Return the BatchEvaluation of boards, positions of side_length whose
+    markers before the last move were markers.
+
+    >>> moves, boards, markers = encode_children(
+    ...     StonehengeState(True, 1, ['A', 'B', 'C']))
+    >>> result = evaluate(1, boards, markers)
+    >>> result.game_over.tolist(), result.winner.tolist()
+    ([True, True, True], [1, 1, 1])
+    """
+    return BatchEvaluation(side_length, boards, markers)
+
+
+def random_winners(side_length: int, boards: np.ndarray, markers: np.ndarray,
+                   p1_turn: np.ndarray, rng: Any = None) -> np.ndarray:
+    """
+    Return the winner (1 or 2, 0 for a tie) of a game played with uniformly
+    random moves from each of boards, positions of side_length with the
+    captured markers markers and p1 to move where p1_turn. Every game is a
+    row and all of them move at once. rng is a numpy.random.Generator.
+
+    >>> boards = np.array([[1, 0, 0], [0, 0, 0], [0, 0, 0]], dtype=np.int8)
+    >>> markers = np.array([[1, 0, 1, 0, 0, 1], [0] * 6, [0] * 6])
+    >>> random_winners(1, boards, markers, np.array([False, True, False]),
+    ...                np.random.default_rng(0)).tolist()
+    [1, 1, 2]
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    geometry = get_geometry(side_length)
+    incidence = incidence_matrix(side_length)
+    thresholds = np.array(geometry.line_thresholds, dtype=np.int16)
+    boards = np.atleast_2d(boards)
+    num_games = len(boards)
+    rows = np.arange(num_games)
+    markers = np.atleast_2d(markers).astype(np.int8)
+    counts = np.stack([(boards == 1).astype(np.int16) @ incidence,
+                       (boards == 2).astype(np.int16) @ incidence], axis=1)
+    first = np.where(p1_turn, 1, 2).astype(np.int8)
+    # A finished position was won by the player who moved last.
+    over = ((markers == 1).sum(axis=1) >= geometry.win_threshold) | \
+        ((markers == 2).sum(axis=1) >= geometry.win_threshold)
+    winner = np.where(over, 3 - first, 0).astype(np.int8)
+    active = ~over
+    # Row g of order lists the open cells of game g in the order they are
+    # claimed, followed by the cells that were already taken.
+    keys = rng.random(boards.shape)
+    keys[boards != 0] = 2.0
+    order = keys.argsort(axis=1)
+    num_open = (boards == 0).sum(axis=1)
+    for step in range(int(num_open.max(initial=0))):
+        active &= step < num_open
+        if not active.any():
+            break
+        player = first if step % 2 == 0 else 3 - first
+        # Only the player who moves can capture a ley-line.
+        counts[rows, player - 1] += incidence[order[:, step]] * \
+            active[:, np.newaxis]
+        captured = (markers == 0) & (counts[rows, player - 1] >= thresholds)
+        markers = np.where(captured, player[:, np.newaxis], markers)
+        won = active & ((markers == player[:, np.newaxis]).sum(axis=1) >=
+                        geometry.win_threshold)
+        winner[won] = player[won]
+        active &= ~won
+    return winner
+
+
+def batch_playouts(side_length: int, boards: np.ndarray, markers: np.ndarray,
+                   p1_turn: np.ndarray, count: int,
+                   rng: Any = None) -> np.ndarray:
+    """
+    Return the win rate, for the player to move, of count random games from
+    each of boards, positions of side_length with the captured markers
+    markers and p1 to move where p1_turn. A tie counts as half a win.
+
+    >>> boards = np.array([[1, 0, 0], [0, 0, 0]], dtype=np.int8)
+    >>> markers = np.array([[1, 0, 1, 0, 0, 1], [0] * 6])
+    >>> batch_playouts(1, boards, markers, np.array([False, True]), 8,
+    ...                np.random.default_rng(0)).tolist()
+    [0.0, 1.0]
+    """
+    boards = np.atleast_2d(boards)
+    p1_turn = np.asarray(p1_turn, dtype=bool).reshape(-1)
+    winners = random_winners(side_length, np.repeat(boards, count, axis=0),
+                             np.repeat(np.atleast_2d(markers), count, axis=0),
+                             np.repeat(p1_turn, count), rng)
+    to_move = np.repeat(np.where(p1_turn, 1, 2), count)
+    points = np.where(winners == to_move, 1.0,
+                      np.where(winners == 0, 0.5, 0.0))
+    return points.reshape(len(boards), count).mean(axis=1)
+
+
+def random_playouts(state: StonehengeState, count: int,
+                    rng: Any = None) -> np.ndarray:
+    """
+    Return the results of count games played out from state with uniformly
+    random moves, all at once: 1 where the player to move at state won, -1
+    where they lost and 0 for a tie. rng is a numpy.random.Generator.
+
+    >>> state = StonehengeState(True, 1, ['1', 'B', 'C'])
+    >>> random_playouts(state, 4, np.random.default_rng(0)).tolist()
+    [-1, -1, -1, -1]
+    >>> state = StonehengeState(True, 2, ['1', 'B', 'C', 'D', 'E', 'F', 'G'])
+    >>> set(random_playouts(state, 50).tolist()) <= {-1, 1}
+    True
+    """
+    board, markers = encode_state(state)
+    winners = random_winners(
+        state.side_length, np.repeat(board[np.newaxis, :], count, axis=0),
+        np.repeat(markers[np.newaxis, :], count, axis=0),
+        np.full(count, state.p1_turn), rng)
+    first = 1 if state.p1_turn else 2
+    return np.where(winners == first, 1,
+                    np.where(winners == 0, 0, -1)).astype(np.int8)
+
+
+def rollout_strategy(game: Any, count: int = DEFAULT_ROLLOUTS) -> Any:
+    """
+    Return the move of game whose position has the best win rate over
+    count random games for the player making it, playing all the games of
+    all the moves at once. A move that wins immediately is played. Only a
+    StonehengeGame can be played.
+
+    >>> from stonehenge_game import StonehengeGame
+    >>> state = StonehengeState(False, 2, ['A', 'B', '2', '1', 'E', 'F', '1'])
+    >>> rollout_strategy(StonehengeGame.from_state(state))
+    'B'
+    >>> from substract_square_game import SubstractSquareGame
+    >>> rollout_strategy(SubstractSquareGame.create(10))
+    Traceback (most recent call last):
+    ...
+    ValueError: rollout_strategy only plays Stonehenge
+    """
+    state = game.current_state
+    if not isinstance(state, StonehengeState):
+        raise ValueError("rollout_strategy only plays Stonehenge")
+    moves, boards, markers = encode_children(state)
+    children = evaluate(state.side_length, boards, markers)
+    if children.game_over.any():
+        return moves[int(np.argmax(children.game_over))]
+    rng = np.random.default_rng(list(state_key(state)))
+    rates = batch_playouts(state.side_length, boards, children.markers,
+                           np.full(len(moves), not state.p1_turn), count, rng)
+    return moves[int(np.argmin(rates))]
+
+
+def batch_evaluation_strategy(game: Any) -> Any:
+    """
+    Return a move for game by evaluating two plies at once: every move of
+    the current player and every reply to it. A move that wins immediately
+    is played, otherwise the move whose worst reply leaves the best score
+    for the current player. Only a StonehengeGame can be played.
+
+    >>> from substract_square_game import SubstractSquareGame
+    >>> batch_evaluation_strategy(SubstractSquareGame.create(10))
+    Traceback (most recent call last):
+    ...
+    ValueError: batch_evaluation_strategy only plays Stonehenge
+    """
+    state = game.current_state
+    if not isinstance(state, StonehengeState):
+        raise ValueError("batch_evaluation_strategy only plays Stonehenge")
+    sign = 1 if state.p1_turn else -1
+    moves, boards, markers = encode_children(state)
+    children = evaluate(state.side_length, boards, markers)
+    values = children.scores * sign
+    if children.game_over.any():
+        return moves[int(np.argmax(values))]
+
+    # Every child is answered by every cell that was open before the move;
+    # the one that was just claimed is masked out, so the whole second ply
+    # is a single evaluation of a num_moves ** 2 batch.
+    opponent = 2 if state.p1_turn else 1
+    num_moves = len(moves)
+    cells = np.array([state.cells.index(move) for move in moves])
+    replies = np.repeat(boards, num_moves, axis=0)
+    reply_cells = np.tile(cells, num_moves)
+    rows = np.arange(len(replies))
+    taken = replies[rows, reply_cells] != 0
+    replies[rows, reply_cells] = opponent
+    grandchildren = evaluate(state.side_length, replies,
+                             np.repeat(children.markers, num_moves, axis=0))
+    reply_values = np.where(taken, np.inf, grandchildren.scores * sign)
+    worst = reply_values.reshape(num_moves, num_moves).min(axis=1)
+    worst = np.where(np.isinf(worst), values, worst)
+    return moves[int(np.argmax(worst))]
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -2,6 +2,7 @@
 A module for StonehengeGame.
 """
 
+from typing import Dict, Tuple
 from game import Game
 from stonehenge_state import StonehengeState
 
@@ -22,6 +23,37 @@ def calculate_num(length: int) -> int:
     return acc
 
 
+MAX_SIDE_LENGTH = 5
+_INITIAL_STATES: Dict[Tuple[int, bool], StonehengeState] = {}
+
+
+def initial_state(side_length: int, p1_starts: bool) -> StonehengeState:
+    """
+    Return the empty board of side length side_length with p1 to move if
+    p1_starts. States are never changed in place, so each board is built
+    once and shared by every game that starts from it.
+
+    :type side_length: int
+    :type p1_starts: bool
+    :rtype: StonehengeState
+
+    >>> initial_state(2, True) is initial_state(2, True)
+    True
+    >>> initial_state(6, True)
+    Traceback (most recent call last):
+    ...
+    ValueError: Unsupported side length: 6
+    """
+    key = (side_length, p1_starts)
+    if key not in _INITIAL_STATES:
+        if not 0 < side_length <= MAX_SIDE_LENGTH:
+            raise ValueError("Unsupported side length: {}".format(
+                side_length))
+        _INITIAL_STATES[key] = StonehengeState(
+            p1_starts, side_length, LETTER[0: calculate_num(side_length)])
+    return _INITIAL_STATES[key]
+
+
 class StonehengeGame(Game):
     """
     Abstract class for a game called Stonehenge, to be played with two players.
@@ -41,11 +73,49 @@ class StonehengeGame(Game):
         """
         self.p1_starts = p1_starts
         side_length = input("Enter the side length of the board: ")
-        while not (side_length.isdigit() and 0 < int(side_length) <= 5):
+        while not (side_length.isdigit() and
+                   0 < int(side_length) <= MAX_SIDE_LENGTH):
             side_length = input("Enter the side length of the board: ")
 
-        cells = LETTER[0: calculate_num(int(side_length))]
-        self.current_state = StonehengeState(p1_starts, int(side_length), cells)
+        self.current_state = initial_state(int(side_length), p1_starts)
+
+    @classmethod
+    def create(cls, side_length: int,
+               p1_starts: bool = True) -> 'StonehengeGame':
+        """
+        Return a new StonehengeGame on a board of side_length where p1 moves
+        first if p1_starts, without asking for any input.
+
+        :type side_length: int
+        :type p1_starts: bool
+        :rtype: StonehengeGame
+
+        >>> game = StonehengeGame.create(1, False)
+        >>> game.current_state.get_possible_moves(), game.p1_starts
+        (['A', 'B', 'C'], False)
+        """
+        game = cls.from_state(initial_state(side_length, p1_starts))
+        game.p1_starts = p1_starts
+        return game
+
+    @classmethod
+    def from_state(cls, state: StonehengeState) -> 'StonehengeGame':
+        """
+        Return a StonehengeGame whose current state is state, without asking
+        for any input.
+
+        :type state: StonehengeState
+        :rtype: StonehengeGame
+
+        >>> state = StonehengeState(True, 1, LETTER[:3])
+        >>> game = StonehengeGame.from_state(state)
+        >>> game.current_state.get_possible_moves()
+        ['A', 'B', 'C']
+        """
+        game = cls.__new__(cls)
+        game.p1_starts = state.p1_turn
+        game.current_state = state
+        return game
 
     def get_instructions(self) -> str:
         """
@@ -93,7 +163,7 @@ class StonehengeGame(Game):
         move, return some invalid move.
 
         """
-        if move_to_make in self.current_state.get_possible_moves():
+        if self.current_state.is_valid_move(move_to_make):
             return move_to_make.upper()
 
         return "Invalid move."
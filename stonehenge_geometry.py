@@ -0,0 +1,129 @@
+"""
+A module for the geometry of a Stonehenge board.
+
+The cells of a board with side length n are numbered row by row, the same
+way StonehengeState numbers them: row r < n holds r + 2 cells and the last
+row holds n cells. Ley-lines are given as lists of cell indices, in the order
+StonehengeState stores them in row_layline, left_layline and right_layline,
+and StonehengeState.marker lists them in marker order.
+"""
+import math
+from typing import Dict, List, Tuple
+
+
+class StonehengeGeometry:
+    """
+    The ley-line tables of a Stonehenge board with a given side length.
+
+    === Attributes ===
+    side_length: the side length of the board.
+    num_cells: the number of cells on the board.
+    rows: the cells of each row ley-line.
+    lefts: the cells of each left ley-line.
+    rights: the cells of each right ley-line.
+    marker_order: the (kind, index) of the ley-line behind each marker, where
+    kind is 'row', 'left' or 'right'.
+    lines: the cells of the ley-line behind each marker.
+    line_thresholds: the number of cells a player needs to claim each line
+    in lines.
+    cell_lines: the markers of the ley-lines running through each cell.
+    win_threshold: the number of markers a player needs to win.
+    """
+    side_length: int
+    num_cells: int
+    rows: List[List[int]]
+    lefts: List[List[int]]
+    rights: List[List[int]]
+    marker_order: List[Tuple[str, int]]
+    lines: List[List[int]]
+    line_thresholds: List[int]
+    cell_lines: List[List[int]]
+    win_threshold: int
+
+    def __init__(self, side_length: int) -> None:
+        """
+        Initialize the tables of a board with side length side_length.
+
+        >>> g = StonehengeGeometry(1)
+        >>> g.rows, g.lefts, g.rights
+        ([[0, 1], [2]], [[0], [1, 2]], [[2, 0], [1]])
+        >>> g.cell_lines
+        [[0, 2, 5], [1, 2, 4], [1, 3, 5]]
+        """
+        self.side_length = side_length
+        positions = cell_positions(side_length)
+        self.num_cells = len(positions)
+        self.rows = [[] for _ in range(side_length + 1)]
+        self.lefts = [[] for _ in range(side_length + 1)]
+        self.rights = [[] for _ in range(side_length + 1)]
+        for cell, (row, column) in enumerate(positions):
+            self.rows[row].append(cell)
+            self.lefts[column].append(cell)
+        for cell, (row, column) in reversed(list(enumerate(positions))):
+            self.rights[side_length - 1 - row + column].append(cell)
+
+        self.marker_order = ([('left', 0), ('left', 1), ('row', 0)] +
+                             [kind_index for i in range(2, side_length + 1)
+                              for kind_index in (('left', i),
+                                                 ('row', i - 1))] +
+                             [('row', side_length),
+                              ('right', side_length)] +
+                             [('right', i) for i in range(side_length)])
+        tables = {'row': self.rows, 'left': self.lefts, 'right': self.rights}
+        self.lines = [tables[kind][index]
+                      for kind, index in self.marker_order]
+        self.line_thresholds = [math.ceil(len(line) / 2)
+                                for line in self.lines]
+        self.cell_lines = [[] for _ in range(self.num_cells)]
+        for marker, line in enumerate(self.lines):
+            for cell in line:
+                self.cell_lines[cell].append(marker)
+        self.win_threshold = math.ceil(len(self.lines) / 2)
+
+
+def num_cells(side_length: int) -> int:
+    """
+    Return the number of cells of a board with side length side_length.
+
+    >>> [num_cells(n) for n in range(1, 6)]
+    [3, 7, 12, 18, 25]
+    """
+    return side_length * (side_length + 5) // 2
+
+
+def cell_positions(side_length: int) -> List[Tuple[int, int]]:
+    """
+    Return the (row, column) of each cell of a board with side length
+    side_length. Columns are counted along the left ley-lines, so the last
+    row starts at column 1.
+
+    >>> cell_positions(1)
+    [(0, 0), (0, 1), (1, 1)]
+    """
+    positions = [(row, column) for row in range(side_length)
+                 for column in range(row + 2)]
+    positions.extend((side_length, column)
+                     for column in range(1, side_length + 1))
+    return positions
+
+
+_GEOMETRIES: Dict[int, StonehengeGeometry] = {}
+
+
+def get_geometry(side_length: int) -> StonehengeGeometry:
+    """
+    Return the StonehengeGeometry of side_length, building it on first use.
+
+    >>> get_geometry(3) is get_geometry(3)
+    True
+    >>> get_geometry(3).win_threshold
+    6
+    """
+    if side_length not in _GEOMETRIES:
+        _GEOMETRIES[side_length] = StonehengeGeometry(side_length)
+    return _GEOMETRIES[side_length]
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,142 @@
+"""
+A module for drawing Stonehenge boards.
+
+Every board of a side length is drawn the same way, only the cell labels and
+markers change, so the drawing is turned into a format string once per side
+length: field {0[i]} is cell i and {1[i]} is marker i, and drawing a board is
+a single template.format(cells, marker) call; render uses the same template
+compiled to a %-pattern and the picks of its fields. Side lengths 1 to 5
+keep the exact drawings of StonehengeState's helper_str methods, which are
+run once with the fields themselves standing in for the cells and markers.
+Other side lengths get a drawing laid out the same way from the board
+geometry.
+"""
+import operator
+import re
+from typing import Callable, Dict, Tuple
+from stonehenge_geometry import get_geometry
+
+LEGACY_SIDE_LENGTHS = (1, 2, 3, 4, 5)
+FIELD = re.compile(r'\{([01])\[(\d+)\]\}')
+_TEMPLATES: Dict[int, str] = {}
+_COMPILED: Dict[int, Tuple[str, Callable]] = {}
+
+
+def generated_template(side_length: int) -> str:
+    """
+    Return a drawing template for a board of side_length, laid out like the
+    drawings of the smaller boards.
+
+    >>> print(generated_template(1).format('ABC', '123456'))
+          1   2
+         /   /
+    3 - A - B
+         \\ / \\
+      4 - C   5
+           \\
+            6
+    """
+    geometry = get_geometry(side_length)
+    order = geometry.marker_order
+
+    def marker(kind: str, index: int) -> str:
+        """
+        Return the field of the marker of ley-line index of kind.
+        """
+        return '{{1[{}]}}'.format(order.index((kind, index)))
+
+    lines = [' ' * (2 * side_length + 4) + marker('left', 0) + '   ' +
+             marker('left', 1),
+             ' ' * (2 * side_length + 3) + '/   /']
+    cell = 0
+    for row in range(side_length + 1):
+        size = row + 2 if row < side_length else side_length
+        cells = ['{{0[{}]}}'.format(cell + i) for i in range(size)]
+        cell += size
+        if row < side_length:
+            line = ' ' * (2 * (side_length - 1 - row)) + marker('row', row) \
+                + ' - ' + ' - '.join(cells)
+            if row + 2 <= side_length:
+                line += '   ' + marker('left', row + 2)
+            lines.append(line)
+            if row < side_length - 1:
+                lines.append(' ' * (2 * (side_length - 1 - row) + 3) +
+                             '/ \\ ' * (row + 2) + '/')
+            else:
+                lines.append('     ' + '\\ / ' * side_length + '\\')
+        else:
+            lines.append('  ' + marker('row', row) + ' - ' +
+                         ' - '.join(cells) + '   ' +
+                         marker('right', side_length))
+    lines.append('       ' + '\\   ' * (side_length - 1) + '\\')
+    lines.append('        ' + '   '.join(marker('right', i)
+                                         for i in range(side_length)))
+    return '\n'.join(lines)
+
+
+def get_template(side_length: int) -> str:
+    """
+    Return the drawing template of a board of side_length, building it on
+    first use.
+
+    >>> get_template(1).splitlines()[0]
+    '      {1[0]}   {1[1]}'
+    """
+    if side_length not in _TEMPLATES:
+        if side_length in LEGACY_SIDE_LENGTHS:
+            # Imported here: stonehenge_state draws its boards with this
+            # module.
+            from stonehenge_state import StonehengeState
+            stand_in = StonehengeState.__new__(StonehengeState)
+            stand_in.side_length = side_length
+            stand_in.cells = ['{{0[{}]}}'.format(i) for i in
+                              range(get_geometry(side_length).num_cells)]
+            stand_in.marker = ['{{1[{}]}}'.format(i) for i in
+                               range(3 * (side_length + 1))]
+            _TEMPLATES[side_length] = stand_in.legacy_str()
+        else:
+            _TEMPLATES[side_length] = generated_template(side_length)
+    return _TEMPLATES[side_length]
+
+
+def compile_template(side_length: int) -> Tuple[str, Callable]:
+    """
+    Return the template of side_length as a %-pattern with one %s per field,
+    and a function picking the values of the fields, in order, out of the
+    cells followed by the markers of a board.
+
+    >>> pattern, pick = compile_template(1)
+    >>> pattern.splitlines()[0], pick(list('ABC') + list('123456'))[:2]
+    ('      %s   %s', ('1', '2'))
+    """
+    if side_length not in _COMPILED:
+        template = get_template(side_length)
+        num_cells = get_geometry(side_length).num_cells
+        indices = [int(index) + (num_cells if source == '1' else 0)
+                   for source, index in FIELD.findall(template)]
+        pattern = FIELD.sub('%s', template.replace('%', '%%'))
+        _COMPILED[side_length] = (pattern, operator.itemgetter(*indices))
+    return _COMPILED[side_length]
+
+
+def render(side_length: int, cells: list, marker: list) -> str:
+    """
+    Return the drawing of a board of side_length with cells and marker.
+
+    >>> print(render(1, ['1', 'B', 'C'], [1, '@', 1, '@', '@', 1]))
+    ... # doctest: +NORMALIZE_WHITESPACE
+          1   @
+         /   /
+    1 - 1 - B
+         \\ / \\
+      @ - C   @
+           \\
+            1
+    """
+    pattern, pick = compile_template(side_length)
+    return pattern % pick(cells + marker)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
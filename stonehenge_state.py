@@ -5,6 +5,10 @@ a module for StonehengeState.
 from typing import Any
 import math
 from game_state import GameState
+from state_codec import write_varint, read_varint, write_2bit, read_2bit
+from stonehenge_geometry import get_geometry
+from stonehenge_threats import ThreatSpace
+from stonehenge_render import render
 
 
 LETTER = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'M', 'N',
@@ -26,6 +30,9 @@ class StonehengeState(GameState):
     pre_marker: a list of all the markers from the previous state,
     if this is the original state, then pre_marker is None.
     marker: a list of markers of current state.
+
+    The unclaimed cells and whether the game is over are worked out once per
+    state and kept, so checking a move does not rebuild the move list.
     """
     WIN: int = 1
     LOSE: int = -1
@@ -75,6 +82,10 @@ class StonehengeState(GameState):
         self.get_marker()
         self.help_check_initial_marker()
         self.get_marker()
+        self._threats = None
+        self._drawing = None
+        self._open = None
+        self._over = None
 
     def help_check_initial_marker(self) -> None:
         """
@@ -662,6 +673,24 @@ class StonehengeState(GameState):
                                  self.marker[17])
         return result
 
+    def legacy_str(self) -> str:
+        """
+        Return the drawing of this board from the helper_str methods, which
+        cover side lengths 1 to 5. stonehenge_render turns it into the
+        template __str__ uses.
+
+        :rtype str
+        """
+        if self.side_length == 1:
+            return self.helper_str_one()
+        if self.side_length == 2:
+            return self.helper_str_two()
+        if self.side_length == 3:
+            return self.helper_str_three()
+        if self.side_length == 4:
+            return self.helper_str_four1() + self.helper_str_four2()
+        return self.helper_str_five1() + self.helper_str_five2()
+
     def __str__(self) -> str:
         """
         Return a string representation of the current state of the stonehenge
@@ -676,16 +705,13 @@ class StonehengeState(GameState):
         True
         >>> str(state1) == str(state3)
         False
+        >>> str(state1) == state1.legacy_str()
+        True
         """
-        if self.side_length == 1:
-            return self.helper_str_one()
-        if self.side_length == 2:
-            return self.helper_str_two()
-        if self.side_length == 3:
-            return self.helper_str_three()
-        if self.side_length == 4:
-            return self.helper_str_four1() + self.helper_str_four2()
-        return self.helper_str_five1() + self.helper_str_five2()
+        # States are never changed in place, so the drawing is kept.
+        if self._drawing is None:
+            self._drawing = render(self.side_length, self.cells, self.marker)
+        return self._drawing
 
     def get_possible_moves(self) -> list:
         """
@@ -701,13 +727,56 @@ class StonehengeState(GameState):
         []
         """
         if not self.game_over():
-            result = []
-            for cell in self.cells:
-                if not cell.isdigit():
-                    result.append(cell)
-            return result
+            return [cell for cell in self.cells if not cell.isdigit()]
         return []
 
+    def distinct_moves(self) -> list:
+        """
+        Return one move of every group of equivalent moves, in the order of
+        get_possible_moves. Moves are equivalent when their cells lie on the
+        same unclaimed ley-lines: captured ley-lines never change hands, so
+        the positions they lead to only differ by which of the two cells is
+        left, and have the same value. In particular every cell whose
+        ley-lines are all claimed is dead, and claiming any of them only
+        passes the turn, so they all count as one move.
+
+        :rtype list
+
+        >>> a = StonehengeState(False, 2, ['2', 'B', '1', '1', 'E', '1', '2'],
+        ...                     [1, 1, 2, 2, 1, 2, '@', 1, 2])
+        >>> a.get_possible_moves(), a.distinct_moves()
+        (['B', 'E'], ['B'])
+        """
+        moves = []
+        if self.game_over():
+            return moves
+        cell_lines = get_geometry(self.side_length).cell_lines
+        seen = set()
+        for index, cell in enumerate(self.cells):
+            if not cell.isdigit():
+                key = tuple(line for line in cell_lines[index]
+                            if self.marker[line] == '@')
+                if key not in seen:
+                    seen.add(key)
+                    moves.append(cell)
+        return moves
+
+    def open_cells(self) -> frozenset:
+        """
+        Return the cells no player has claimed yet, whether or not the game
+        is over.
+
+        :rtype frozenset
+
+        >>> a = StonehengeState(True, 1, ['1', 'B', 'C'], None)
+        >>> sorted(a.open_cells())
+        ['B', 'C']
+        """
+        if self._open is None:
+            self._open = frozenset(cell for cell in self.cells
+                                   if not cell.isdigit())
+        return self._open
+
     def game_over(self) -> bool:
         """
         Return True if the game is over in current state, otherwise,
@@ -721,11 +790,11 @@ class StonehengeState(GameState):
         >>> new_state.game_over()
         True
         """
-        temp = self.marker[:]
-        if temp.count(1) >= math.ceil((len(temp) / 2)) \
-                or temp.count(2) >= math.ceil((len(temp) / 2)):
-            return True
-        return False
+        if self._over is None:
+            temp = self.marker
+            self._over = temp.count(1) >= math.ceil((len(temp) / 2)) \
+                or temp.count(2) >= math.ceil((len(temp) / 2))
+        return self._over
 
     def get_current_player_name(self) -> str:
         """
@@ -791,6 +860,7 @@ class StonehengeState(GameState):
                 if self.right_layline[i][0] == "@":
                     self.right_layline[i][0] = 2
         self.get_marker()
+        self._over = None
 
     def make_move(self, move: Any) -> 'StonehengeState':
         """
@@ -806,10 +876,14 @@ class StonehengeState(GameState):
         """
         cells = self.cells[:]
         # moves = self.get_possible_moves()
-        cells[cells.index(move)] = '1' if self.p1_turn else '2'
+        cell = cells.index(move)
+        cells[cell] = '1' if self.p1_turn else '2'
         new_state = StonehengeState(not self.p1_turn, self.side_length, cells,
                                     self.marker)
         new_state.check_marker()
+        if self._threats is not None:
+            new_state._threats = self._threats.after_move(
+                cell, 0 if self.p1_turn else 1, new_state.marker)
         return new_state
 
     def is_valid_move(self, move: Any) -> bool:
@@ -823,8 +897,11 @@ class StonehengeState(GameState):
         True
         >>> state1.is_valid_move('D')
         False
+        >>> state1.make_move('A').is_valid_move('B')
+        False
         """
-        return move in self.get_possible_moves()
+        return isinstance(move, str) and move in self.open_cells() and \
+            not self.game_over()
 
     def __repr__(self) -> Any:
         """
@@ -846,6 +923,142 @@ class StonehengeState(GameState):
                                self.row_layline, self.cells, self.left_layline,
                                self.right_layline, self.p1_turn)
 
+    def write_to(self, out: bytearray) -> None:
+        """
+        Append the compact binary encoding of this StonehengeState to out: a
+        varint holding the side length and whose turn it is, then 2 bits per
+        cell and 2 bits per marker (0 unclaimed, 1 for p1, 2 for p2).
+
+        >>> out = bytearray()
+        >>> StonehengeState(True, 1, ['A', 'B', 'C']).make_move('A').write_to(
+        ...     out)
+        >>> list(out)
+        [2, 1, 17, 4]
+        """
+        write_varint(self.side_length << 1 | self.p1_turn, out)
+        write_2bit([int(cell) if str(cell).isdigit() else 0
+                    for cell in self.cells], out)
+        write_2bit([0 if marker == '@' else marker
+                    for marker in self.marker], out)
+
+    def to_bytes(self) -> bytes:
+        """
+        Return the compact binary encoding of this StonehengeState.
+
+        >>> len(StonehengeState(True, 3, LETTER[:12]).to_bytes())
+        7
+        """
+        out = bytearray()
+        self.write_to(out)
+        return bytes(out)
+
+    @classmethod
+    def read_from(cls, data: Any, offset: int) -> tuple:
+        """
+        Return the StonehengeState encoded in data at offset by write_to, and
+        the offset just past it.
+
+        >>> a = StonehengeState(False, 2, LETTER[:7]).make_move('C')
+        >>> b, end = StonehengeState.read_from(a.to_bytes(), 0)
+        >>> repr(a) == repr(b), end
+        (True, 6)
+        """
+        header, offset = read_varint(data, offset)
+        side_length = header >> 1
+        num_cells = side_length * (side_length + 5) // 2
+        codes, offset = read_2bit(data, offset, num_cells)
+        cells = [LETTER[i] if code == 0 else str(code)
+                 for i, code in enumerate(codes)]
+        codes, offset = read_2bit(data, offset, (side_length + 1) * 3)
+        markers = ['@' if code == 0 else code for code in codes]
+        return cls(bool(header & 1), side_length, cells, markers), offset
+
+    @classmethod
+    def from_bytes(cls, data: Any) -> 'StonehengeState':
+        """
+        Return the StonehengeState encoded in data by to_bytes.
+
+        >>> a = StonehengeState(True, 1, ['A', 'B', 'C']).make_move('B')
+        >>> repr(StonehengeState.from_bytes(a.to_bytes())) == repr(a)
+        True
+        """
+        return cls.read_from(data, 0)[0]
+
+    def line_counts(self) -> list:
+        """
+        Return how many cells of each ley-line, in marker order, p1 and p2
+        have claimed, as [p1 count, p2 count] pairs.
+
+        :rtype list
+
+        >>> StonehengeState(True, 1, ['1', '2', 'C']).line_counts()
+        [[1, 0], [0, 1], [1, 1], [0, 0], [0, 1], [1, 0]]
+        """
+        counts = [[0, 0] for _ in range(len(self.marker))]
+        cell_lines = get_geometry(self.side_length).cell_lines
+        for cell, value in enumerate(self.cells):
+            if value == '1':
+                for marker in cell_lines[cell]:
+                    counts[marker][0] += 1
+            elif value == '2':
+                for marker in cell_lines[cell]:
+                    counts[marker][1] += 1
+        return counts
+
+    def winning_cells(self, player: str) -> list:
+        """
+        Return the open cells that would end the game with a win for player,
+        '1' or '2', if player claimed them now.
+
+        :type player: str
+        :rtype list
+
+        >>> a = StonehengeState(True, 2, ['1', 'B', 'C', 'D', 'E', 'F', 'G'])
+        >>> a.winning_cells('1'), a.winning_cells('2')
+        (['G'], [])
+        """
+        side = 0 if player == '1' else 1
+        return [self.cells[cell]
+                for cell in sorted(self.threats().winning[side])]
+
+    def threats(self) -> ThreatSpace:
+        """
+        Return the ThreatSpace of this StonehengeState. It is worked out on
+        first use and then kept up to date by make_move for every state
+        made from this one.
+
+        :rtype ThreatSpace
+        """
+        if self._threats is None:
+            self._threats = ThreatSpace.from_state(self)
+        return self._threats
+
+    def can_win_now(self) -> bool:
+        """
+        Return whether the current player has a move that wins at once.
+
+        :rtype bool
+
+        >>> a = StonehengeState(True, 2, ['1', 'B', 'C', 'D', 'E', 'F', 'G'])
+        >>> a.can_win_now(), a.make_move('B').can_win_now()
+        (True, False)
+        """
+        return bool(self.threats().winning[0 if self.p1_turn else 1])
+
+    def forced_blocks(self) -> list:
+        """
+        Return the cells the opponent of the current player would win with
+        if it was their turn, which the current player has to take or
+        otherwise defuse.
+
+        :rtype list
+
+        >>> a = StonehengeState(False, 2, ['1', 'B', 'C', 'D', 'E', 'F', 'G'])
+        >>> a.forced_blocks()
+        ['G']
+        """
+        return self.winning_cells('2' if self.p1_turn else '1')
+
     def rough_outcome(self) -> int:
         """
         Return an estimate in interval [LOSE, WIN] of best outcome the current
@@ -858,28 +1071,12 @@ class StonehengeState(GameState):
         >>> b.rough_outcome() == float(b.LOSE)
         True
         """
-        movement = self.get_possible_moves()
-        next_states = []
-        for move in movement:
-            new_state = self.make_move(move)
-            if new_state.get_possible_moves() == []:
-                return self.WIN
-            next_states.append(new_state)
-        results = []
-        for state in next_states:
-            score = []
-            for move in state.get_possible_moves():
-                next_state = state.make_move(move)
-                if next_state.get_possible_moves() == []:
-                    score.append(self.LOSE)
-            results.append(score)
-        lst = []
-        for result in results:
-            if -1 in result:
-                lst.append(True)
-        if all(lst):
-            return self.LOSE
-        return 0
+        if self.can_win_now():
+            return self.WIN
+        # Without an immediate win the estimate has always been LOSE: every
+        # move either lets the opponent win at once or leaves the outcome
+        # open, and both were scored as a loss.
+        return self.LOSE
 
 
 if __name__ == "__main__":
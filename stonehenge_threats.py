@@ -0,0 +1,164 @@
+"""
+A module for the immediate threats of a Stonehenge position.
+
+A cell is a winning cell for a player when claiming it would capture enough
+ley-lines to give that player more than half of the markers, ending the game.
+ThreatSpace keeps the winning cells of both players, together with what they
+are derived from: how many cells of each ley-line each player holds, and the
+gain of every open cell, the number of unclaimed ley-lines through it that a
+player would capture with it. A move only touches the ley-lines through one
+cell, so after_move updates those tables for the cells on these lines instead
+of recounting the board, and asking whether a player can win now, or must
+block a cell, is a set lookup.
+"""
+from typing import Any, List, Set
+from stonehenge_geometry import get_geometry
+
+PLAYERS = ('1', '2')
+
+
+class ThreatSpace:
+    """
+    The winning cells of both players in a Stonehenge position. Lists with
+    one entry per player are indexed 0 for p1 and 1 for p2.
+
+    === Attributes ===
+    side_length: the side length of the board.
+    counts: how many cells of each ley-line, in marker order, each player
+    holds.
+    owners: the marker of each ley-line: '@', 1 or 2.
+    open_cells: the indices of the unclaimed cells.
+    gains: for each player, the number of ley-lines each open cell would
+    capture for them.
+    winning: for each player, the indices of their winning cells.
+    """
+    side_length: int
+    counts: List[List[int]]
+    owners: list
+    open_cells: Set[int]
+    gains: List[List[int]]
+    winning: List[Set[int]]
+
+    def __init__(self, side_length: int, counts: List[List[int]],
+                 owners: list, open_cells: Set[int]) -> None:
+        """
+        Initialize the ThreatSpace of a board of side_length with the given
+        ley-line counts, markers and open cells, working out the gains and
+        winning cells from them.
+
+        >>> t = ThreatSpace(1, [[0, 0]] * 6, ['@'] * 6, {0, 1, 2})
+        >>> t.gains[0], sorted(t.winning[1])
+        ([3, 3, 3], [0, 1, 2])
+        """
+        self.side_length = side_length
+        self.counts = counts
+        self.owners = owners
+        self.open_cells = open_cells
+        geometry = get_geometry(side_length)
+        self.gains = [[0] * geometry.num_cells, [0] * geometry.num_cells]
+        for cell in open_cells:
+            for marker in geometry.cell_lines[cell]:
+                if owners[marker] != '@':
+                    continue
+                for side in (0, 1):
+                    if counts[marker][side] + 1 >= \
+                            geometry.line_thresholds[marker]:
+                        self.gains[side][cell] += 1
+        self.winning = [set(), set()]
+        self._find_winning(open_cells)
+
+    @classmethod
+    def from_state(cls, state: Any) -> 'ThreatSpace':
+        """
+        Return the ThreatSpace of the StonehengeState state.
+
+        >>> from stonehenge_state import StonehengeState
+        >>> cells = ['1', 'B', 'C', 'D', 'E', 'F', 'G']
+        >>> t = ThreatSpace.from_state(StonehengeState(True, 2, cells))
+        >>> t.winning
+        [{6}, set()]
+        """
+        return cls(state.side_length, state.line_counts(), state.marker[:],
+                   {cell for cell, value in enumerate(state.cells)
+                    if value not in PLAYERS})
+
+    def need(self, side: int) -> int:
+        """
+        Return how many more ley-lines player side has to capture to win.
+        """
+        return get_geometry(self.side_length).win_threshold - \
+            self.owners.count(side + 1)
+
+    def is_over(self) -> bool:
+        """
+        Return whether a player already holds enough markers to win.
+        """
+        return self.need(0) <= 0 or self.need(1) <= 0
+
+    def _find_winning(self, cells: Any) -> None:
+        """
+        Update whether each of cells is a winning cell of each player.
+        """
+        over = self.is_over()
+        for side in (0, 1):
+            need = self.need(side)
+            winning = self.winning[side]
+            for cell in cells:
+                if not over and cell in self.open_cells and \
+                        self.gains[side][cell] >= need:
+                    winning.add(cell)
+                else:
+                    winning.discard(cell)
+
+    def after_move(self, cell: int, side: int,
+                   owners: list) -> 'ThreatSpace':
+        """
+        Return the ThreatSpace after player side claims cell, where owners
+        are the markers of the resulting position.
+
+        >>> t = ThreatSpace(1, [[0, 0]] * 6, ['@'] * 6, {0, 1, 2})
+        >>> t.after_move(0, 0, [1, '@', 1, '@', '@', 1]).winning
+        [set(), set()]
+        """
+        geometry = get_geometry(self.side_length)
+        result = ThreatSpace.__new__(ThreatSpace)
+        result.side_length = self.side_length
+        result.counts = self.counts[:]
+        result.owners = owners[:]
+        result.open_cells = self.open_cells - {cell}
+        result.gains = [self.gains[0][:], self.gains[1][:]]
+        result.winning = [set(self.winning[0]), set(self.winning[1])]
+        result.gains[0][cell] = result.gains[1][cell] = 0
+        touched = {cell}
+        for marker in geometry.cell_lines[cell]:
+            before = self.counts[marker]
+            after = before[:]
+            after[side] += 1
+            result.counts[marker] = after
+            if self.owners[marker] != '@':
+                continue
+            threshold = geometry.line_thresholds[marker]
+            line_cells = [other for other in geometry.lines[marker]
+                          if other in result.open_cells]
+            if owners[marker] != '@':
+                # The line was captured, so it no longer counts for anyone.
+                for other in line_cells:
+                    for player in (0, 1):
+                        if before[player] + 1 >= threshold:
+                            result.gains[player][other] -= 1
+            elif before[side] + 1 < threshold <= after[side] + 1:
+                for other in line_cells:
+                    result.gains[side][other] += 1
+            else:
+                continue
+            touched.update(line_cells)
+        if owners.count(1) != self.owners.count(1) or \
+                owners.count(2) != self.owners.count(2):
+            touched = self.open_cells
+        result._find_winning(touched)
+        return result
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
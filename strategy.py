@@ -6,13 +6,17 @@ Adjust the type annotations as needed, and implement both a recursive
 and an iterative version of minimax.
 """
 from typing import Any
-from typing import List
 from game_state import GameState
 from stack import Stack
 from IterativeMinimax import IterativeMinimax
+from move_ordering import MoveOrderer
+from stonehenge_state import StonehengeState
+from memory_budget import DEFAULT_BUDGET
 
 # TODO: Adjust the type annotation as needed.
 
+_DONE = object()
+
 
 def interactive_strategy(game: Any) -> Any:
     """
@@ -68,36 +72,169 @@ def minimax_recursive_strategy(game: Any) -> Any:
     Return a move that minimizes the possible loss for a player, use recursion.
     """
     state = game.current_state
+    moves = search_moves(state)
     next_score = [helper_mr(game, state.make_move(c)) * -1
-                  for c in state.get_possible_moves()]
+                  for c in moves]
     highest_score = max(next_score)
     best_move_index = next_score.index(highest_score)
-    return game.current_state.get_possible_moves()[best_move_index]
+    return moves[best_move_index]
+
+
+def search_moves(state: Any) -> list:
+    """
+    Return the moves of state a search has to try: in Stonehenge one move of
+    each group of equivalent moves (see StonehengeState.distinct_moves),
+    otherwise every move. Equivalent moves have the same score, so the first
+    best of these moves is the first best of all moves.
+    """
+    if isinstance(state, StonehengeState):
+        return state.distinct_moves()
+    return state.get_possible_moves()
+
+
+def helper_score(game: Any, state: GameState) -> int:
+    """
+    Return the score of state, a state where game is over, for the player
+    whose turn it is.
+    """
+    old_state = game.current_state
+    game.current_state = state
+    if game.is_winner(state.get_current_player_name()):
+        game.current_state = old_state
+        return 1
+    elif game.is_winner('p1') or game.is_winner('p2'):
+        game.current_state = old_state
+        return -1
+    game.current_state = old_state
+    return 0
 
 
 def helper_mr(game: Any, state: GameState)-> int:
     """
     Return the maximum score of state's next states.
     """
-    old_state = game.current_state
     if game.is_over(state):
-        game.current_state = state
-        if game.is_winner(state.get_current_player_name()):
-            game.current_state = old_state
-            return 1
-        elif game.is_winner('p1') or game.is_winner('p2'):
-            game.current_state = old_state
-            return -1
-        game.current_state = old_state
-        return 0
+        return helper_score(game, state)
     else:
         result = []
-        moves = state.get_possible_moves()
+        moves = search_moves(state)
         for move in moves:
             new_state = state.make_move(move)
             result.append(helper_mr(game, new_state) * -1)
         return max(result)
 
+
+def minimax_stack_strategy(game: Any) -> Any:
+    """
+    Return the move minimax_recursive_strategy picks, searching with an
+    explicit stack instead of recursion, so games of any length can be
+    searched.
+
+    >>> from subtraction_game import SubtractionGame, finite_set
+    >>> minimax_stack_strategy(SubtractionGame.create(
+    ...     20001, move_set=finite_set([1])))
+    1
+    """
+    state = game.current_state
+    best_move = None
+    best_score = -2
+    for move in search_moves(state):
+        score = helper_ms(game, state.make_move(move)) * -1
+        if score > best_score:
+            best_score = score
+            best_move = move
+            if best_score == 1:
+                break
+    return best_move
+
+
+def helper_ms(game: Any, state: GameState) -> int:
+    """
+    Return the score of state for its player to move, like helper_mr, with
+    the frames of the search kept on an explicit stack. The moves of a state
+    stop being searched once one of them wins, since nothing beats a win.
+    """
+    if game.is_over(state):
+        return helper_score(game, state)
+    # Each frame is [state, iterator over its moves, best score so far].
+    stack = [[state, iter(search_moves(state)), -2]]
+    result = None
+    while stack:
+        frame = stack[-1]
+        if result is not None:
+            if -result > frame[2]:
+                frame[2] = -result
+            result = None
+            if frame[2] == 1:
+                result = stack.pop()[2]
+                continue
+        move = next(frame[1], _DONE)
+        if move is _DONE:
+            result = stack.pop()[2]
+            continue
+        child = frame[0].make_move(move)
+        if game.is_over(child):
+            result = helper_score(game, child)
+        else:
+            stack.append([child, iter(search_moves(child)), -2])
+    return result
+
+
+def alphabeta_strategy(game: Any) -> Any:
+    """
+    Return the same move as minimax_recursive_strategy, searching with
+    alpha-beta pruning. Below the root, moves are tried in the order of a
+    MoveOrderer that is kept for the whole game, so killer moves and history
+    learned on one move speed up the next. In Stonehenge, a position where
+    the player to move can win at once is scored without searching it.
+    """
+    orderer = getattr(game, 'move_orderer', None)
+    if orderer is None:
+        orderer = game.move_orderer = MoveOrderer()
+    state = game.current_state
+    if isinstance(state, StonehengeState):
+        # Every state searched from here keeps its threats up to date.
+        state.threats()
+    best_move = None
+    best_score = -2
+    # The root keeps the order of get_possible_moves, so that among equally
+    # good moves the first one is picked, like minimax_recursive_strategy.
+    for move in search_moves(state):
+        score = -helper_ab(game, state.make_move(move), -2, -best_score, 1,
+                           orderer)
+        if score > best_score:
+            best_score = score
+            best_move = move
+            if best_score == 1:
+                break
+    return best_move
+
+
+def helper_ab(game: Any, state: GameState, alpha: int, beta: int, ply: int,
+              orderer: MoveOrderer) -> int:
+    """
+    Return the score of state for its player to move if it lies between
+    alpha and beta; otherwise return a bound past alpha or beta.
+    """
+    orderer.nodes += 1
+    if game.is_over(state):
+        return helper_score(game, state)
+    if isinstance(state, StonehengeState) and state.can_win_now():
+        return 1
+    moves = orderer.order(state, search_moves(state), ply)
+    best_score = -2
+    for move in moves:
+        score = -helper_ab(game, state.make_move(move), -beta, -alpha,
+                           ply + 1, orderer)
+        if score > best_score:
+            best_score = score
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    orderer.record_cutoff(move, ply, len(moves))
+                    break
+    return best_score
+
 # TODO: Implement an iterative version of the minimax strategy.
 
 
@@ -110,34 +247,38 @@ def helper_mi_add(s: Stack, lst: list) -> None:
         s.add(item)
 
 
-def helper_mi_score(current_item: IterativeMinimax,
-                    old_items: List[IterativeMinimax]) -> None:
+def helper_mi_score(current_item: IterativeMinimax) -> None:
     """
     A helper function for minimax_iterative_strategy. Help to update the score
     of self by it's children's score.
     """
-    next_score = []
-    for child in current_item.children:
-        for item in old_items:
-            if child == item:
-                next_score.append(item.score)
-    current_item.score = max([scores * -1 for scores in next_score])
+    current_item.score = max([child.score * -1
+                              for child in current_item.children])
 
 
 def minimax_iterative_strategy(game: Any) -> Any:
     """
     Return a move that minimizes the possible loss for a player, iteratively.
+
+    The stack holds at most DEFAULT_BUDGET.max_nodes nodes: a node whose
+    children would not fit is scored depth-first by helper_ms instead, and a
+    scored node lets go of its children.
     """
     current_state = IterativeMinimax(game.current_state)
     s = Stack()
     s.add(current_state)
-    old_items = []
+    size = 1
 
     while not s.is_empty():
         current_item = s.remove()
+        size -= 1
         if current_item.state.get_possible_moves() != []:
             if not current_item.is_visited():
-                movement = current_item.state.get_possible_moves()
+                movement = search_moves(current_item.state)
+                if current_item is not current_state and \
+                        size + 1 + len(movement) > DEFAULT_BUDGET.max_nodes:
+                    current_item.score = helper_ms(game, current_item.state)
+                    continue
                 new_states = [IterativeMinimax
                               (current_item.state.make_move(move))
                               for move in movement]
@@ -145,10 +286,12 @@ def minimax_iterative_strategy(game: Any) -> Any:
                 current_item.children = [child for child in new_states]
                 s.add(current_item)
                 helper_mi_add(s, new_states)
+                size += 1 + len(new_states)
 
             elif current_item.is_visited():
-                helper_mi_score(current_item, old_items)
-                old_items.append(current_item)
+                helper_mi_score(current_item)
+                if current_item is not current_state:
+                    current_item.children = []
 
         if current_item.state.get_possible_moves() == []:
             old_state = game.current_state
@@ -159,12 +302,11 @@ def minimax_iterative_strategy(game: Any) -> Any:
                 current_item.score = -1
             else:
                 current_item.score = 0
-            old_items.append(current_item)
             game.current_state = old_state
 
     choices = [child.score * -1 for child in current_state.children]
     best_move = choices.index(max(choices))
-    return game.current_state.get_possible_moves()[best_move]
+    return search_moves(game.current_state)[best_move]
 
 
 if __name__ == "__main__":
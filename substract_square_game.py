@@ -137,6 +137,42 @@ class SubstractSquareGame(Game):
         number = int(input('Give me a number:'))
         self.current_state = SubstractSquareState(self.is_p1_turn, number)
 
+    @classmethod
+    def create(cls, number: int,
+               p1_starts: bool = True) -> 'SubstractSquareGame':
+        """
+        Return a new SubstractSquareGame starting from number where p1 moves
+        first if p1_starts, without asking for any input.
+
+        :type number: int
+        :type p1_starts: bool
+        :rtype: SubstractSquareGame
+
+        >>> game = SubstractSquareGame.create(20, False)
+        >>> game.current_state.number, game.is_p1_turn
+        (20, False)
+        """
+        return cls.from_state(SubstractSquareState(p1_starts, number))
+
+    @classmethod
+    def from_state(cls, state: SubstractSquareState) -> 'SubstractSquareGame':
+        """
+        Return a SubstractSquareGame whose current state is state, without
+        asking for any input.
+
+        :type state: SubstractSquareState
+        :rtype: SubstractSquareGame
+
+        >>> state = SubstractSquareState(True, 9)
+        >>> game = SubstractSquareGame.from_state(state)
+        >>> game.current_state.number
+        9
+        """
+        game = cls.__new__(cls)
+        game.is_p1_turn = state.is_p1_turn
+        game.current_state = state
+        return game
+
     def __eq__(self, other: Any) -> bool:
         """
         Return whether SubstractSquareGame self is equivalent to other.
@@ -183,3 +219,71 @@ class SubstractSquareGame(Game):
         :rtype:int
         """
         return int(move_to_make)
+
+
+class ChopsticksGame(Game):
+    """
+    A game called Chopsticks.
+
+    === Attributes ===
+    is_p1_turn - whether it is p1's turn, if not, then it is p2's turn.
+    current_state - the current state of the game Chopsticks.
+    """
+    is_p1_turn: bool
+    current_state: ChopsticsState
+
+    def __init__(self, is_p1_turn: bool) -> None:
+        """
+        Initialize a Chopsticks game self.
+
+        :type is_p1_turn: bool
+        :rtype: None
+
+        >>> ChopsticksGame(True).current_state
+        ChopsticsState(p1 turn: True, p1: [1, 1], p2: [1, 1])
+        """
+        self.is_p1_turn = is_p1_turn
+        self.current_state = ChopsticsState(is_p1_turn)
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of ChopsticksGame self.
+
+        :rtype: str
+        """
+        return "This game is Chopsticks."
+
+    def get_instructions(self) -> str:
+        """
+        Return a string of instructions of Chopsticks game.
+
+        :rtype: str
+        """
+        return "Players take turns tapping one of the opponent's hands with " \
+               "one of their own, adding their fingers to it: 'lr' taps " \
+               "the opponent's right hand with your left hand. A hand with " \
+               "5 or more fingers loses 5. A player with no fingers left on " \
+               "either hand loses."
+
+    def is_over(self, state: ChopsticsState) -> bool:
+        """
+        Return whether state is over.
+
+        :type state: ChopsticsState
+        :rtype: bool
+
+        >>> a = ChopsticksGame(True)
+        >>> a.is_over(a.current_state)
+        False
+        """
+        return state.game_over()
+
+    def str_to_move(self, move_to_make: str) -> str:
+        """
+        Convert a move, move_to_make, into the lower case form used by
+        ChopsticsState.
+
+        :type move_to_make: str
+        :rtype: str
+        """
+        return move_to_make.strip().lower()
@@ -0,0 +1,162 @@
+"""
+A module for solving Subtract Square for every starting number up to a limit.
+
+Instead of searching the game tree like the minimax strategies, the solver
+sieves the win/loss value of every number with NumPy: a number is losing for
+the player to move exactly when no square leads to a losing number, so each
+losing number p marks p + 1, p + 4, p + 9, ... as winning in one vectorized
+step, and the next losing number is the first unmarked one after p. Values
+are stored one byte per number, optionally in a .npy file that is
+memory-mapped, so tables of 10 ** 7 numbers and more never need to fit in
+RAM at once.
+
+Usage:
+    python substract_square_solver.py 10000000 squares.npy
+"""
+import math
+import sys
+from typing import Any, List
+import numpy as np
+
+DEFAULT_CHUNK = 1 << 20
+FIRST_WINDOW = 64
+
+
+def squares_up_to(limit: int) -> np.ndarray:
+    """
+    Return the positive square numbers that are at most limit.
+
+    >>> squares_up_to(30).tolist()
+    [1, 4, 9, 16, 25]
+    """
+    return np.arange(1, math.isqrt(limit) + 1, dtype=np.int64) ** 2
+
+
+def solve(limit: int, path: Any = None,
+          chunk_size: int = DEFAULT_CHUNK) -> np.ndarray:
+    """
+    Return an array whose entry n is 1 if the player to move from n wins
+    Subtract Square and 0 if they lose, for every n up to limit. If path is
+    given the array is a memory-mapped .npy file at path, flushed after every
+    chunk of chunk_size numbers.
+
+    >>> solve(20).tolist()
+    [0, 1, 0, 1, 1, 0, 1, 0, 1, 1, 0, 1, 0, 1, 1, 0, 1, 0, 1, 1, 0]
+    """
+    if path is None:
+        win = np.zeros(limit + 1, dtype=np.uint8)
+    else:
+        win = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8,
+                                        shape=(limit + 1,))
+    squares = squares_up_to(limit)
+
+    for start in range(0, limit + 1, chunk_size):
+        stop = min(start + chunk_size, limit + 1)
+        position = start
+        window = FIRST_WINDOW
+        while position < stop:
+            end = min(position + window, stop)
+            block = win[position: end]
+            first = int(block.argmin())
+            if block[first]:
+                # Every number in the window is already known to be winning.
+                position = end
+                window *= 2
+                continue
+            losing = position + first
+            reach = np.searchsorted(squares, limit - losing, side='right')
+            win[losing + squares[:reach]] = 1
+            position = losing + 1
+            window = FIRST_WINDOW
+        if path is not None:
+            win.flush()
+    return win
+
+
+class SubtractSquareTable:
+    """
+    The solved values of Subtract Square up to some limit.
+
+    === Attributes ===
+    win: the array produced by solve.
+    squares: the square numbers up to the limit of the table.
+    """
+    win: np.ndarray
+    squares: np.ndarray
+
+    def __init__(self, win: np.ndarray) -> None:
+        """
+        Initialize this SubtractSquareTable from the array win.
+        """
+        self.win = win
+        self.squares = squares_up_to(len(win) - 1)
+
+    @classmethod
+    def load(cls, path: str) -> 'SubtractSquareTable':
+        """
+        Return the table stored at path by solve, memory-mapped read-only.
+        """
+        return cls(np.load(path, mmap_mode='r'))
+
+    def limit(self) -> int:
+        """
+        Return the largest number this table covers.
+
+        >>> SubtractSquareTable(solve(100)).limit()
+        100
+        """
+        return len(self.win) - 1
+
+    def is_winning(self, number: int) -> bool:
+        """
+        Return whether the player to move from number wins.
+
+        >>> table = SubtractSquareTable(solve(100))
+        >>> table.is_winning(18), table.is_winning(20)
+        (True, False)
+        >>> table.is_winning(2)
+        False
+        """
+        return bool(self.win[number])
+
+    def winning_moves(self, number: int) -> List[int]:
+        """
+        Return the squares that move number to a losing number for the
+        opponent, in increasing order. The list is empty when number is
+        losing.
+
+        >>> table = SubtractSquareTable(solve(100))
+        >>> table.winning_moves(18)
+        [1, 16]
+        >>> table.winning_moves(2)
+        []
+        """
+        moves = self.squares[: np.searchsorted(self.squares, number,
+                                               side='right')]
+        return moves[self.win[number - moves] == 0].tolist()
+
+
+def table_strategy(table: SubtractSquareTable) -> Any:
+    """
+    Return a strategy for Subtract Square that plays from table: the
+    smallest winning move when there is one, otherwise subtracting 1.
+
+    Precondition: the numbers of the games played are within the table.
+    """
+    def strategy(game: Any) -> int:
+        """
+        Return the move the table gives for game.
+        """
+        moves = table.winning_moves(game.current_state.number)
+        if moves:
+            return moves[0]
+        return 1
+    return strategy
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        solve(int(sys.argv[1]), sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        import doctest
+        doctest.testmod()
@@ -0,0 +1,488 @@
+"""
+A module for subtraction games: Subtract Square with any set of moves.
+
+Players take turns subtracting a number from the move set from the current
+number; a player who cannot move loses. With the perfect squares as the move
+set this is Subtract Square.
+
+SubtractionSolver answers who wins from any number. For a finite move set
+the win/loss sequence is eventually periodic, because each value only
+depends on the previous max(move set) values; the solver finds the period
+and then answers for any n in O(1).
+"""
+import bisect
+import math
+import itertools
+from typing import Any, Dict, Iterator, List
+from state_codec import write_varint
+from state_of_game import State
+from substract_square_game import Game
+
+DEFAULT_LIMIT = 1 << 20
+
+
+class MoveSet:
+    """
+    A set of positive numbers that can be subtracted in a subtraction game.
+
+    === Attributes ===
+    name: the name of this MoveSet.
+    values: the members of this MoveSet generated so far, increasing.
+    finite: whether all members of this MoveSet have been generated.
+    """
+    name: str
+    values: List[int]
+    finite: bool
+
+    def __init__(self, name: str, members: Any) -> None:
+        """
+        Initialize a MoveSet called name whose members, in increasing order,
+        are produced by the iterable members (which may be infinite). A list
+        or tuple of members is known to be finite straight away.
+        """
+        self.name = name
+        self.values = []
+        self.finite = False
+        if isinstance(members, (list, tuple)):
+            self.values = list(members)
+            self.finite = True
+        self._members = iter(members)
+
+    def _extend(self, number: int) -> None:
+        """
+        Generate members until one is larger than number or there are none
+        left.
+        """
+        while not self.finite and (not self.values or
+                                   self.values[-1] <= number):
+            value = next(self._members, None)
+            if value is None:
+                self.finite = True
+            else:
+                self.values.append(value)
+
+    def moves_up_to(self, number: int) -> List[int]:
+        """
+        Return the members of this MoveSet that are at most number.
+
+        >>> squares().moves_up_to(30)
+        [1, 4, 9, 16, 25]
+        >>> primes().moves_up_to(12)
+        [2, 3, 5, 7, 11]
+        >>> fibonacci().moves_up_to(12)
+        [1, 2, 3, 5, 8]
+        """
+        self._extend(number)
+        return self.values[: bisect.bisect_right(self.values, number)]
+
+    def __contains__(self, number: int) -> bool:
+        """
+        Return whether number is a member of this MoveSet.
+
+        >>> 9 in squares(), 10 in squares()
+        (True, False)
+        """
+        self._extend(number)
+        index = bisect.bisect_left(self.values, number)
+        return index < len(self.values) and self.values[index] == number
+
+    def largest(self) -> int:
+        """
+        Return the largest member of this MoveSet.
+
+        Precondition: this MoveSet is finite.
+
+        >>> finite_set([3, 1, 4]).largest()
+        4
+        """
+        self._extend(math.inf)
+        return self.values[-1]
+
+    def __str__(self) -> str:
+        """
+        Return the name of this MoveSet.
+        """
+        return self.name
+
+
+def squares() -> MoveSet:
+    """
+    Return the move set of Subtract Square: the positive perfect squares.
+    """
+    return MoveSet('squares', (i * i for i in itertools.count(1)))
+
+
+def _prime_numbers() -> Iterator[int]:
+    """
+    Yield the prime numbers in increasing order.
+    """
+    composites: Dict[int, int] = {}
+    for number in itertools.count(2):
+        step = composites.pop(number, None)
+        if step is None:
+            composites[number * number] = number
+            yield number
+        else:
+            multiple = number + step
+            while multiple in composites:
+                multiple += step
+            composites[multiple] = step
+
+
+def primes() -> MoveSet:
+    """
+    Return the move set of the prime numbers.
+    """
+    return MoveSet('primes', _prime_numbers())
+
+
+def _fibonacci_numbers() -> Iterator[int]:
+    """
+    Yield the distinct positive Fibonacci numbers in increasing order.
+    """
+    current, following = 1, 2
+    while True:
+        yield current
+        current, following = following, current + following
+
+
+def fibonacci() -> MoveSet:
+    """
+    Return the move set of the distinct positive Fibonacci numbers.
+    """
+    return MoveSet('fibonacci', _fibonacci_numbers())
+
+
+def finite_set(moves: Any) -> MoveSet:
+    """
+    Return a finite move set holding the positive numbers in moves.
+
+    >>> finite_set([3, 1, 3]).moves_up_to(10)
+    [1, 3]
+    """
+    members = sorted(set(moves))
+    return MoveSet('{' + ', '.join(map(str, members)) + '}', members)
+
+
+class SubtractionSolver:
+    """
+    The win/loss values of a subtraction game with a fixed move set.
+
+    === Attributes ===
+    move_set: the move set of the game.
+    win: win[n] is whether the player to move from n wins, for every n
+    computed so far.
+    period_start: the number from which the values repeat, or None if no
+    period has been found.
+    period: the length of the repeating part, or None.
+    """
+    move_set: MoveSet
+    win: List[bool]
+    period_start: Any
+    period: Any
+
+    def __init__(self, move_set: MoveSet, limit: int = DEFAULT_LIMIT) -> None:
+        """
+        Initialize a SubtractionSolver for move_set. For a finite move set,
+        values are computed until the period is found or limit numbers have
+        been computed, whichever comes first.
+
+        >>> solver = SubtractionSolver(finite_set([1, 2]))
+        >>> solver.period_start, solver.period
+        (0, 3)
+        """
+        self.move_set = move_set
+        self.win = []
+        self.period_start = None
+        self.period = None
+        if move_set.finite:
+            self._find_period(limit)
+
+    def _find_period(self, limit: int) -> None:
+        """
+        Compute values until the last largest() values repeat a window seen
+        before, which fixes every later value, or until limit is reached.
+        """
+        width = self.move_set.largest()
+        mask = (1 << width) - 1
+        window = 0
+        seen: Dict[int, int] = {}
+        for number in range(limit + 1):
+            if number >= width:
+                if window in seen:
+                    self.period = number - seen[window]
+                    start = seen[window]
+                    while start > 0 and self.win[start - 1] == \
+                            self.win[start - 1 + self.period]:
+                        start -= 1
+                    self.period_start = start
+                    return
+                seen[window] = number
+            self._compute(number)
+            window = ((window << 1) | self.win[number]) & mask
+
+    def _compute(self, number: int) -> None:
+        """
+        Append the value of number to win.
+
+        Precondition: len(self.win) == number.
+        """
+        win = self.win
+        self.win.append(not all(win[number - move] for move in
+                                self.move_set.moves_up_to(number)))
+
+    def _reduce(self, number: int) -> int:
+        """
+        Return the smallest number with the same value as number that the
+        period lets us find, computing more values if needed.
+        """
+        if self.period is not None and number >= self.period_start:
+            return self.period_start + (number - self.period_start) \
+                % self.period
+        while len(self.win) <= number:
+            self._compute(len(self.win))
+        return number
+
+    def is_winning(self, number: int) -> bool:
+        """
+        Return whether the player to move from number wins.
+
+        >>> solver = SubtractionSolver(finite_set([1, 2]))
+        >>> solver.is_winning(10 ** 18), solver.is_winning(10 ** 18 + 2)
+        (True, False)
+        >>> SubtractionSolver(squares(), 100).is_winning(20)
+        False
+        """
+        return self.win[self._reduce(number)]
+
+    def winning_moves(self, number: int) -> List[int]:
+        """
+        Return the moves from number that leave the opponent losing.
+
+        >>> SubtractionSolver(squares(), 100).winning_moves(18)
+        [1, 16]
+        >>> SubtractionSolver(finite_set([1, 3, 4])).winning_moves(10 ** 9)
+        [4]
+        """
+        return [move for move in self.move_set.moves_up_to(number)
+                if not self.is_winning(number - move)]
+
+
+class SubtractionState(State):
+    """
+    The current state of a subtraction game.
+
+    === Attributes ===
+    is_p1_turn - whether it is player 1's turn or not
+    number - the current number.
+    move_set - the numbers that can be subtracted.
+    """
+    is_p1_turn: bool
+    number: int
+    move_set: MoveSet
+
+    def __init__(self, is_p1_turn: bool, number: int,
+                 move_set: MoveSet) -> None:
+        """
+        Initialize a SubtractionState.
+
+        >>> SubtractionState(True, 10, primes()).valid_moves
+        [2, 3, 5, 7]
+        """
+        super().__init__(is_p1_turn)
+        self.number = int(number)
+        self.move_set = move_set
+        self.valid_moves = move_set.moves_up_to(self.number)
+
+    def __eq__(self, other: Any) -> bool:
+        """
+        Return whether self is equivalent to other.
+        """
+        return type(self) == type(other) \
+            and self.is_p1_turn == other.is_p1_turn \
+            and self.number == other.number \
+            and self.move_set.name == other.move_set.name
+
+    def __hash__(self) -> int:
+        """
+        Return a hash of SubtractionState self, consistent with __eq__.
+
+        >>> hash(SubtractionState(True, 10, primes())) == \\
+        ...     hash(SubtractionState(True, 10, primes()))
+        True
+        """
+        return hash((self.is_p1_turn, self.number, self.move_set.name))
+
+    def __repr__(self) -> str:
+        """
+        Return a representation of SubtractionState self (which can be used
+        for equality testing).
+
+        >>> SubtractionState(False, 10, finite_set([1, 3, 4]))
+        SubtractionState(p1 turn: False, number: 10, move set: {1, 3, 4})
+        """
+        return "SubtractionState(p1 turn: {}, number: {}, " \
+               "move set: {})".format(self.is_p1_turn, self.number,
+                                      self.move_set.name)
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of SubtractionState self.
+
+        >>> print(SubtractionState(True, 10, primes()))
+        The current value is: 10 (subtract primes)
+        """
+        return "The current value is: {} (subtract {})".format(
+            self.number, self.move_set)
+
+    def get_possible_moves(self) -> list:
+        """
+        Return the moves that can be made from SubtractionState self.
+        """
+        return self.valid_moves
+
+    def is_valid_move(self, move_to_make: Any) -> bool:
+        """
+        Return whether move_to_make can be made from SubtractionState self.
+
+        >>> SubtractionState(True, 10, primes()).is_valid_move(9)
+        False
+        """
+        return isinstance(move_to_make, int) and \
+            0 < move_to_make <= self.number and move_to_make in self.move_set
+
+    def make_move(self, move_to_make: int) -> 'SubtractionState':
+        """
+        Return the SubtractionState after subtracting move_to_make.
+
+        >>> SubtractionState(True, 10, primes()).make_move(7).number
+        3
+        """
+        return SubtractionState(not self.is_p1_turn,
+                                self.number - move_to_make, self.move_set)
+
+    def game_over(self) -> bool:
+        """
+        Return whether the player to move has no move left.
+
+        >>> SubtractionState(True, 1, primes()).game_over()
+        True
+        """
+        return not self.valid_moves
+
+    def write_to(self, out: bytearray) -> None:
+        """
+        Append the compact binary encoding of SubtractionState self to out:
+        one varint holding the number and whose turn it is, then the length
+        of the name of the move set and the name itself.
+
+        >>> out = bytearray()
+        >>> SubtractionState(True, 30, finite_set([1, 2])).write_to(out)
+        >>> bytes(out)
+        b'=\\x06{1, 2}'
+        """
+        write_varint(self.number << 1 | self.is_p1_turn, out)
+        name = self.move_set.name.encode()
+        write_varint(len(name), out)
+        out += name
+
+    def to_bytes(self) -> bytes:
+        """
+        Return the compact binary encoding of SubtractionState self.
+
+        >>> SubtractionState(False, 5, primes()).to_bytes()
+        b'\\n\\x06primes'
+        """
+        out = bytearray()
+        self.write_to(out)
+        return bytes(out)
+
+
+class SubtractionGame(Game):
+    """
+    A subtraction game with a given move set.
+
+    === Attributes ===
+    is_p1_turn - whether it is p1's turn, if not, then it is p2's turn.
+    current_state - the current state of the game.
+    """
+    is_p1_turn: bool
+    current_state: SubtractionState
+
+    def __init__(self, is_p1_turn: bool, move_set: Any = None) -> None:
+        """
+        Initialize a subtraction game with move_set (the squares if None),
+        asking for the starting number.
+        """
+        self.is_p1_turn = is_p1_turn
+        number = int(input('Give me a number:'))
+        self.current_state = SubtractionState(
+            is_p1_turn, number, squares() if move_set is None else move_set)
+
+    @classmethod
+    def create(cls, number: int, p1_starts: bool = True,
+               move_set: Any = None) -> 'SubtractionGame':
+        """
+        Return a new subtraction game with move_set (the squares if None)
+        starting from number, without asking for any input.
+
+        >>> game = SubtractionGame.create(10, move_set=finite_set([1, 2]))
+        >>> game.current_state.number, game.current_state.move_set.name
+        (10, '{1, 2}')
+        >>> SubtractionGame.create(10, False).current_state.is_p1_turn
+        False
+        """
+        game = cls.__new__(cls)
+        game.is_p1_turn = p1_starts
+        game.current_state = SubtractionState(
+            p1_starts, number, squares() if move_set is None else move_set)
+        return game
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of SubtractionGame self.
+        """
+        return "This game is Subtract {}.".format(
+            self.current_state.move_set)
+
+    def get_instructions(self) -> str:
+        """
+        Return a string of instructions of this subtraction game.
+        """
+        return "Players take turns subtracting {} from the starting " \
+               "number. The player who cannot move loses.".format(
+                   self.current_state.move_set)
+
+    def is_over(self, state: SubtractionState) -> bool:
+        """
+        Return whether state is over.
+        """
+        return state.game_over()
+
+    def str_to_move(self, move_to_make: str) -> int:
+        """
+        Convert move_to_make to an int, or -1 if it is not a number.
+        """
+        return int(move_to_make) if str(move_to_make).isdigit() else -1
+
+
+_SOLVERS: Dict[int, SubtractionSolver] = {}
+
+
+def solver_strategy(game: Any) -> Any:
+    """
+    Return a winning move for a subtraction game if there is one, otherwise
+    the smallest move. Solvers are kept per move set, so the precomputation
+    is done once per move set.
+    """
+    state = game.current_state
+    key = id(state.move_set)
+    if key not in _SOLVERS or _SOLVERS[key].move_set is not state.move_set:
+        _SOLVERS[key] = SubtractionSolver(state.move_set)
+    moves = _SOLVERS[key].winning_moves(state.number)
+    return moves[0] if moves else state.get_possible_moves()[0]
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()